@@ -1,10 +1,104 @@
 import os
 import json
 import re
-from openai import OpenAI
+import time
+import asyncio
+import httpx
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+import openai
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
 
-# Initialize OpenAI client - reads from environment variable
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+from . import resilience, rule_parser
+from .categorizer import CATEGORIZER_OVERRIDE_THRESHOLD, categorizer
+from .parse_cache import cache
+from .parse_stats import stats
+from .single_flight import SingleFlight
+
+# Maximum number of OpenAI calls in flight per worker
+MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "20"))
+
+# Initialize OpenAI client - reads from environment variable. One pooled HTTP
+# client is shared by every request so connections are reused. Retries and
+# deadlines are handled by the guard below rather than by the SDK.
+client = AsyncOpenAI(
+    api_key=os.getenv("OPENAI_API_KEY"),
+    max_retries=0,
+    timeout=resilience.OPENAI_TIMEOUT,
+    http_client=DefaultAsyncHttpxClient(
+        limits=httpx.Limits(max_connections=MAX_CONCURRENCY, max_keepalive_connections=MAX_CONCURRENCY),
+    ),
+)
+_llm_slots = asyncio.Semaphore(MAX_CONCURRENCY)
+
+# Parse cache lookups and writes touch the database. They get their own
+# threads, so a burst of parses can't queue up the default executor that
+# CRUD writes run in.
+_cache_threads = ThreadPoolExecutor(max_workers=4, thread_name_prefix="parse-cache")
+
+# Timeouts, 429s and 5xx are retried and count against the circuit breaker
+guard = resilience.Guard(retryable=(openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError))
+
+# Seconds one parse_batch chunk may spend on OpenAI, retries included
+OPENAI_BATCH_TIMEOUT = float(os.getenv("OPENAI_BATCH_TIMEOUT", "60"))
+
+# Lines packed into one prompt by parse_batch, bounded by the model's output size
+BATCH_CHUNK_SIZE = 50
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+class InFlight:
+    """
+    Registry of OpenAI parse calls in progress, keyed by normalized input.
+
+    Identical inputs that arrive while a call is running wait for it instead
+    of starting their own, so a retrying client or a shared account costs one
+    upstream call.
+    """
+
+    def __init__(self):
+        self._flights = SingleFlight()
+        self.upstream_calls = 0
+        self.coalesced = 0
+
+    async def run(self, user_input: str, call) -> Tuple[dict, bool]:
+        """
+        Return call()'s result, shared with every concurrent caller of the
+        same input, and whether it came from another caller's call.
+        """
+        async def upstream_call():
+            self.upstream_calls += 1
+            return await call()
+
+        result, shared = await self._flights.run(_flight_key(user_input), upstream_call)
+        if shared:
+            self.coalesced += 1
+            return _copy_result(result), True
+        return result, False
+
+    def stats(self) -> dict:
+        requests = self.upstream_calls + self.coalesced
+        return {
+            "in_flight": len(self._flights),
+            "upstream_calls": self.upstream_calls,
+            "coalesced": self.coalesced,
+            "saved_ratio": round(self.coalesced / requests, 4) if requests else 0.0,
+        }
+
+
+def _flight_key(user_input: str) -> str:
+    # Unlike the parse cache key the amount is kept, since results carry it
+    return _WHITESPACE.sub(" ", user_input.casefold()).strip()
+
+
+def _copy_result(result: dict) -> dict:
+    if result.get("data") is None:
+        return dict(result)
+    return {**result, "data": dict(result["data"])}
+
+
+in_flight = InFlight()
 
 CATEGORIES = [
     "Food & Drink",
@@ -17,7 +111,62 @@ CATEGORIES = [
     "Other"
 ]
 
-def parse_transaction(user_input: str) -> dict:
+# ============== Prompt ==============
+
+# Static, so every call shares the same prompt prefix; the categories live
+# in the tool schema instead of the text
+SYSTEM_PROMPT = (
+    "You parse personal finance transactions. amount: positive number from $, digits or words. "
+    "description: short and clean. Income (paycheck, salary, freelance, deposit, refund, payment received): "
+    "transaction_type income, category Income. Otherwise expense and the best category."
+)
+
+_TRANSACTION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "amount": {"type": "number"},
+        "description": {"type": "string"},
+        "category": {"type": "string", "enum": CATEGORIES},
+        "transaction_type": {"type": "string", "enum": ["expense", "income"]},
+    },
+    "required": ["amount", "description", "category", "transaction_type"],
+}
+
+_PARSE_TOOL = {
+    "type": "function",
+    "function": {
+        "name": "record_transaction",
+        "description": "Record the parsed transaction.",
+        "parameters": _TRANSACTION_SCHEMA,
+    },
+}
+
+# Batch items carry the number of the line they parse, so a skipped or
+# reordered item can't shift results onto the wrong lines
+_BATCH_ITEM_SCHEMA = {
+    **_TRANSACTION_SCHEMA,
+    "properties": {"line": {"type": "integer"}, **_TRANSACTION_SCHEMA["properties"]},
+    "required": ["line", *_TRANSACTION_SCHEMA["required"]],
+}
+
+_PARSE_BATCH_TOOL = {
+    "type": "function",
+    "function": {
+        "name": "record_transactions",
+        "description": "Record the parsed transactions, one per numbered line.",
+        "parameters": {
+            "type": "object",
+            "properties": {"transactions": {"type": "array", "items": _BATCH_ITEM_SCHEMA}},
+            "required": ["transactions"],
+        },
+    },
+}
+
+# Output budget: one transaction's arguments are ~35 tokens
+MAX_TOKENS = 64
+MAX_TOKENS_PER_BATCH_LINE = 48
+
+async def parse_transaction(user_input: str) -> dict:
     """
     Parse natural language input into structured transaction data.
     
@@ -25,59 +174,191 @@ def parse_transaction(user_input: str) -> dict:
         "Starbucks $8.45" -> {amount: 8.45, description: "Starbucks", category: "Food & Drink", type: "expense"}
         "Paycheck $2500" -> {amount: 2500, description: "Paycheck", category: "Income", type: "income"}
         "Uber to airport 25" -> {amount: 25, description: "Uber to airport", category: "Transportation", type: "expense"}
+    
+    Confident local rule matches, categories of similar saved transactions
+    and cached decisions for previously seen inputs are returned without
+    calling OpenAI. Concurrent identical inputs
+    share one OpenAI call. When OpenAI is unavailable (circuit breaker open,
+    deadline passed or retries used up) the rule parser's best guess is
+    returned, or a failure if it found no amount.
     """
+    started = time.perf_counter()
+    local = await _parse_locally(user_input, started)
+    if local is not None:
+        return local
+    
+    async def call():
+        try:
+            result = await _parse_with_llm(user_input)
+        except resilience.Unavailable as e:
+            return _fallback(user_input, str(e), started)
+        stats.record("llm", time.perf_counter() - started)
+        if result["success"]:
+            await _in_cache_thread(cache.put, user_input, result["data"])
+        return result
     
-    prompt = f"""Parse this transaction into structured data. Extract the amount, description, and categorize it.
+    result, shared = await in_flight.run(user_input, call)
+    if shared:
+        stats.record("coalesced", time.perf_counter() - started)
+    return result
 
-Transaction: "{user_input}"
 
-Available categories: {', '.join(CATEGORIES)}
+async def parse_batch(lines: List[str]) -> List[dict]:
+    """
+    Parse many lines at once, returning one result per line in input order.
+    
+    Lines the local rules or the cache can't answer are sent to OpenAI packed
+    into a single prompt per BATCH_CHUNK_SIZE lines instead of one call each.
+    """
+    results: List[Optional[dict]] = [None] * len(lines)
+    misses = []
+    for index, line in enumerate(lines):
+        if not line.strip():
+            results[index] = {"success": False, "error": "Empty line"}
+            continue
+        results[index] = await _parse_locally(line, time.perf_counter())
+        if results[index] is None:
+            misses.append(index)
+    
+    chunks = [misses[i:i + BATCH_CHUNK_SIZE] for i in range(0, len(misses), BATCH_CHUNK_SIZE)]
+    parsed_chunks = await asyncio.gather(*(
+        _parse_batch_with_llm([lines[i] for i in chunk]) for chunk in chunks
+    ))
+    for chunk, parsed in zip(chunks, parsed_chunks):
+        for index, result in zip(chunk, parsed):
+            results[index] = result
+            # Not rule fallbacks from an outage: they'd be served for the
+            # whole TTL after OpenAI is back
+            if result["success"] and result["data"].get("source") == "llm":
+                await _in_cache_thread(cache.put, lines[index], result["data"])
+    return results
 
-Rules:
-- If it sounds like income (paycheck, salary, payment received, freelance, deposit, refund), set type to "income" and category to "Income"
-- Otherwise, set type to "expense" and choose the most appropriate category
-- Extract the dollar amount (look for $, numbers, or written amounts)
-- The description should be clean and concise
 
-Respond ONLY with valid JSON in this exact format, no other text:
-{{"amount": 0.00, "description": "string", "category": "string", "transaction_type": "expense or income"}}"""
+async def _parse_locally(user_input: str, started: float) -> Optional[dict]:
+    """Answer from the local rules, saved transactions or the parse cache, or None if OpenAI is needed."""
+    local, confidence = rule_parser.parse(user_input)
+    confident = local is not None and confidence >= rule_parser.MIN_CONFIDENCE
+    
+    # Ahead of the rules and the cache, so a category the user corrected wins
+    # over a keyword match or an earlier LLM decision. A confident keyword
+    # match only yields to a near-exact description
+    if local is not None:
+        neighbour = categorizer.predict(local["description"])
+        if neighbour is not None and (not confident or (
+            neighbour[2] >= CATEGORIZER_OVERRIDE_THRESHOLD and neighbour[0] != local["category"]
+        )):
+            category, transaction_type, similarity = neighbour
+            stats.record("neighbours", time.perf_counter() - started)
+            return {
+                "success": True,
+                "data": {
+                    **local,
+                    "category": category,
+                    "transaction_type": transaction_type,
+                    "source": "neighbours",
+                    "confidence": round(similarity, 4),
+                },
+            }
+    
+    if confident:
+        stats.record("rules", time.perf_counter() - started)
+        return {
+            "success": True,
+            "data": {**local, "source": "rules", "confidence": confidence},
+        }
+    
+    # The cache may touch SQLite, so keep it off the event loop
+    cached = await _in_cache_thread(cache.get, user_input)
+    if cached is not None:
+        stats.record("cache", time.perf_counter() - started)
+        return {"success": True, "data": {**cached, "source": "cache"}}
+    return None
 
-    try:
-        response = client.chat.completions.create(
+
+async def _in_cache_thread(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(_cache_threads, fn, *args)
+
+
+def _fallback(user_input: str, error: str, started: float) -> dict:
+    """Answer from the local rules at any confidence while OpenAI is unavailable."""
+    local, confidence = rule_parser.parse(user_input)
+    if local is None:
+        stats.record("unavailable", time.perf_counter() - started)
+        return {"success": False, "error": error}
+    stats.record("fallback", time.perf_counter() - started)
+    return {
+        "success": True,
+        "data": {**local, "source": "rules", "confidence": confidence},
+    }
+
+
+async def _call_tool(
+    path: str, tool: dict, user_content: str, max_tokens: int, lines: int = 1,
+    timeout: float = resilience.OPENAI_TIMEOUT,
+) -> dict:
+    """
+    Make a chat completion that must call the given tool and return its
+    parsed arguments, recording the call's token usage under path.
+
+    Raises resilience.Unavailable when the guard gives up.
+    """
+    async def attempt():
+        return await client.chat.completions.create(
             model="gpt-3.5-turbo",
             messages=[
-                {"role": "system", "content": "You are a financial transaction parser. Respond only with valid JSON, no markdown or extra text."},
-                {"role": "user", "content": prompt}
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": user_content},
             ],
+            tools=[tool],
+            tool_choice={"type": "function", "function": {"name": tool["function"]["name"]}},
             temperature=0.1,
-            max_tokens=150
+            max_tokens=max_tokens,
+            timeout=timeout,
         )
+    
+    # The deadline starts once a slot is free: time queued behind other calls
+    # says nothing about OpenAI's health and mustn't trip the breaker
+    async with _llm_slots:
+        started = time.perf_counter()
+        response = await guard.call(attempt, timeout=timeout)
+    stats.record_usage(path, response.usage, time.perf_counter() - started, lines)
+    
+    tool_calls = response.choices[0].message.tool_calls
+    if not tool_calls:
+        raise ValueError("AI response has no tool call")
+    arguments = json.loads(tool_calls[0].function.arguments)
+    if not isinstance(arguments, dict):
+        raise ValueError("AI response arguments are not an object")
+    return arguments
+
+
+def _validate_result(result: dict) -> dict:
+    """Coerce an LLM result onto the known categories, types and a positive amount."""
+    # Validate category
+    if result.get("category") not in CATEGORIES:
+        result["category"] = "Other"
+    
+    # Validate transaction type
+    if result.get("transaction_type") not in ["expense", "income"]:
+        result["transaction_type"] = "expense"
         
-        result_text = response.choices[0].message.content.strip()
-        
-        # Clean up response if it has markdown code blocks
-        if result_text.startswith("```"):
-            result_text = re.sub(r'^```json?\n?', '', result_text)
-            result_text = re.sub(r'\n?```$', '', result_text)
-        
-        result = json.loads(result_text)
-        
-        # Validate category
-        if result.get("category") not in CATEGORIES:
-            result["category"] = "Other"
-        
-        # Validate transaction type
-        if result.get("transaction_type") not in ["expense", "income"]:
-            result["transaction_type"] = "expense"
-            
-        # Ensure amount is positive
-        result["amount"] = abs(float(result.get("amount", 0)))
-        
+    # Ensure amount is positive
+    result["amount"] = abs(float(result.get("amount", 0)))
+    result["source"] = "llm"
+    return result
+
+
+async def _parse_with_llm(user_input: str) -> dict:
+    """Parse a transaction with a forced OpenAI tool call."""
+    try:
+        arguments = await _call_tool("llm", _PARSE_TOOL, user_input, MAX_TOKENS)
         return {
             "success": True,
-            "data": result
+            "data": _validate_result(arguments)
         }
         
+    except resilience.Unavailable:
+        raise
     except json.JSONDecodeError as e:
         return {
             "success": False,
@@ -88,3 +369,51 @@ Respond ONLY with valid JSON in this exact format, no other text:
             "success": False,
             "error": str(e)
         }
+
+
+async def _parse_batch_with_llm(lines: List[str]) -> List[dict]:
+    """Parse several lines with one forced tool call that returns an array."""
+    numbered = "\n".join(f"{i + 1}. {json.dumps(line)}" for i, line in enumerate(lines))
+    started = time.perf_counter()
+    try:
+        arguments = await _call_tool(
+            "llm_batch", _PARSE_BATCH_TOOL, numbered,
+            max_tokens=16 + MAX_TOKENS_PER_BATCH_LINE * len(lines),
+            lines=len(lines),
+            timeout=OPENAI_BATCH_TIMEOUT,
+        )
+        items = arguments.get("transactions")
+        if not isinstance(items, list):
+            raise ValueError("AI response has no transactions array")
+    except resilience.Unavailable as e:
+        return [_fallback(line, str(e), started) for line in lines]
+    except json.JSONDecodeError as e:
+        return [{"success": False, "error": f"Failed to parse AI response: {str(e)}"}] * len(lines)
+    except Exception as e:
+        return [{"success": False, "error": str(e)}] * len(lines)
+    finally:
+        stats.record("llm_batch", time.perf_counter() - started)
+    
+    by_line = {}
+    duplicates = set()
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        line = item.pop("line", None)
+        if line in by_line:
+            duplicates.add(line)
+        by_line[line] = item
+    
+    results = []
+    for number in range(1, len(lines) + 1):
+        if number in duplicates:
+            results.append({"success": False, "error": f"Duplicate line {number} in AI response"})
+            continue
+        if number not in by_line:
+            results.append({"success": False, "error": "Missing item in AI response"})
+            continue
+        try:
+            results.append({"success": True, "data": _validate_result(by_line[number])})
+        except (TypeError, ValueError) as e:
+            results.append({"success": False, "error": str(e)})
+    return results
@@ -0,0 +1,129 @@
+# In-memory cache of analytics summaries, invalidated by write generation
+import os
+from collections import OrderedDict
+from datetime import date, datetime, time
+from typing import Awaitable, Callable, Optional, Tuple
+
+from . import schemas
+from .single_flight import SingleFlight
+
+# Summaries kept per worker
+ANALYTICS_CACHE_SIZE = int(os.getenv("ANALYTICS_CACHE_SIZE", "256"))
+
+# (first day, last day), None for an open end
+Key = Tuple[Optional[date], Optional[date]]
+# (change token, categories version) at the time the summary was computed
+Generation = Tuple[int, int]
+
+
+def day_key(start_date: Optional[datetime], end_date: Optional[datetime]) -> Optional[Key]:
+    """
+    Get the cache key for a range made of whole days, or None if either bound
+    falls inside a day (such summaries are computed directly).
+
+    A range starts at midnight and ends at the last instant of a day, e.g.
+    2024-03-01T00:00:00 to 2024-03-31T23:59:59.999999.
+    """
+    if start_date is not None and start_date.time() != time.min:
+        return None
+    if end_date is not None and end_date.time() != time.max:
+        return None
+    return (
+        start_date.date() if start_date is not None else None,
+        end_date.date() if end_date is not None else None,
+    )
+
+
+class SummaryCache:
+    """
+    Bounded LRU of analytics summaries for the event loop.
+
+    Every entry is tagged with the generation it was computed at. The
+    generation moves on with every transaction write (the change log seq)
+    and category change, so a lookup at a newer generation drops the entry
+    instead of relying on a TTL. Concurrent misses for the same key and
+    generation share one computation.
+    """
+
+    def __init__(self, max_entries: int = ANALYTICS_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Key, Tuple[Generation, schemas.AnalyticsSummary]]" = OrderedDict()
+        self._flights = SingleFlight()
+        self._generation: Optional[Generation] = None
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.bypassed = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    async def get(
+        self,
+        key: Key,
+        generation: Generation,
+        compute: Callable[[], Awaitable[schemas.AnalyticsSummary]],
+        exact: bool = False,
+    ) -> schemas.AnalyticsSummary:
+        """
+        Get the summary for key at generation, computing it at most once across concurrent callers.
+
+        An entry from a newer generation is served too, unless exact is set
+        (for callers reading a snapshot).
+        """
+        self._advance(generation)
+        entry = self._entries.get(key)
+        if entry is not None and (entry[0] == generation if exact else _covers(entry[0], generation)):
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+        async def miss():
+            self.misses += 1
+            return await compute()
+
+        summary, shared = await self._flights.run((key, generation), miss)
+        if shared:
+            self.coalesced += 1
+        elif _covers(generation, self._generation):
+            self._entries[key] = (generation, summary)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return summary
+
+    def _advance(self, generation: Generation) -> None:
+        """Drop the entries that predate the newest generation seen so far."""
+        if self._generation is None:
+            self._generation = generation
+            return
+        if _covers(self._generation, generation):
+            return
+        self._generation = tuple(max(a, b) for a, b in zip(self._generation, generation))
+        for key, (entry_generation, _) in list(self._entries.items()):
+            if not _covers(entry_generation, self._generation):
+                del self._entries[key]
+                self.invalidations += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.coalesced + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "generation": list(self._generation) if self._generation is not None else None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "bypassed": self.bypassed,
+            "invalidations": self.invalidations,
+            "evictions": self.evictions,
+            "hit_ratio": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+        }
+
+
+def _covers(newer: Generation, older: Generation) -> bool:
+    """Whether newer is at or past older in both the change token and the categories version."""
+    return all(a >= b for a, b in zip(newer, older))
+
+
+cache = SummaryCache()
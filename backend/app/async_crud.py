@@ -0,0 +1,207 @@
+# Async versions of the crud functions for AsyncSession routes
+#
+# Each function runs its crud counterpart with AsyncSession.run_sync, so the
+# queries go through the async driver on the event loop and share one code
+# path (rollups, change log, registry) with the sync callers. ORM results are
+# converted to schemas inside the session, since lazy loads are not possible
+# once the coroutine has returned.
+#
+# Everything a schema reads must already be loaded when it is validated. A
+# lazy load during model_validate does async I/O, so the greenlet switches
+# away in the middle of pydantic-core's native code; other requests then
+# validate on the same thread and corrupt its state, which crashes the
+# interpreter. The crud functions load categories eagerly for this reason.
+#
+# On SQLite, writes run on the sync engine in a worker thread instead (see
+# _write): a write transaction there holds the database-wide write lock, and
+# under run_sync it would keep holding it while the event loop serves other
+# requests, so other writers ran past busy_timeout. Writer threads of one
+# worker also take turns on a lock rather than busy-waiting on each other.
+import asyncio
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import counters, crud, schemas
+from .analytics_cache import cache as summary_cache, day_key
+from .category_registry import registry as category_registry, VERSION_COUNTER
+from .database import SessionLocal, engine
+
+
+def _transactions(rows) -> List[schemas.Transaction]:
+    return [schemas.Transaction.model_validate(t) for t in rows]
+
+
+_sqlite_writer = threading.Lock()
+
+
+async def _write(db: AsyncSession, fn, *args):
+    """Run fn(session, *args), a write, in the request's session or on SQLite in a worker thread."""
+    if engine.dialect.name != "sqlite":
+        return await db.run_sync(fn, *args)
+    return await asyncio.to_thread(_in_sync_session, fn, *args)
+
+
+def _in_sync_session(fn, *args):
+    with _sqlite_writer:
+        db = SessionLocal()
+        try:
+            return fn(db, *args)
+        finally:
+            db.close()
+
+
+# ============== Category Operations ==============
+
+async def get_categories(db: AsyncSession) -> List[schemas.Category]:
+    return await db.run_sync(crud.get_categories)
+
+
+async def get_category(db: AsyncSession, category_id: int) -> Optional[schemas.Category]:
+    return await db.run_sync(crud.get_category, category_id)
+
+
+async def get_categories_by_id(db: AsyncSession) -> Dict[int, schemas.Category]:
+    return await db.run_sync(category_registry.by_id)
+
+
+async def create_category(db: AsyncSession, category: schemas.CategoryCreate) -> schemas.Category:
+    def create(session):
+        return schemas.Category.model_validate(crud.create_category(session, category))
+    return await _write(db, create)
+
+
+# ============== Transaction Operations ==============
+
+async def get_transactions(
+    db: AsyncSession,
+    skip: int = 0,
+    limit: int = 100,
+    category_id: Optional[int] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+) -> List[schemas.Transaction]:
+    def query(session):
+        return _transactions(crud.get_transactions(
+            session, skip=skip, limit=limit, category_id=category_id,
+            start_date=start_date, end_date=end_date,
+        ))
+    return await db.run_sync(query)
+
+
+async def get_transactions_page(
+    db: AsyncSession,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    category_id: Optional[int] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+) -> Tuple[List[schemas.Transaction], Optional[str], Optional[str]]:
+    def query(session):
+        rows, next_cursor, prev_cursor = crud.get_transactions_page(
+            session, limit=limit, cursor=cursor, category_id=category_id,
+            start_date=start_date, end_date=end_date,
+        )
+        return _transactions(rows), next_cursor, prev_cursor
+    return await db.run_sync(query)
+
+
+async def get_transaction(db: AsyncSession, transaction_id: int) -> Optional[schemas.Transaction]:
+    def query(session):
+        transaction = crud.get_transaction(session, transaction_id)
+        return schemas.Transaction.model_validate(transaction) if transaction else None
+    return await db.run_sync(query)
+
+
+async def create_transaction(db: AsyncSession, transaction: schemas.TransactionCreate) -> schemas.Transaction:
+    def create(session):
+        return schemas.Transaction.model_validate(crud.create_transaction(session, transaction))
+    return await _write(db, create)
+
+
+async def bulk_create_transactions(db: AsyncSession, transactions: List[schemas.TransactionCreate]) -> List[int]:
+    # SQLite cannot batch INSERT ... RETURNING in parameter order, so this is one
+    # statement per row; through aiosqlite each one is a thread hand-off. Large
+    # writes are cheaper on the sync driver in a single worker thread.
+    return await asyncio.to_thread(_in_sync_session, crud.bulk_create_transactions, transactions)
+
+
+async def delete_transaction(db: AsyncSession, transaction_id: int) -> bool:
+    return await _write(db, crud.delete_transaction, transaction_id)
+
+
+async def update_transaction(
+    db: AsyncSession, transaction_id: int, transaction: schemas.TransactionCreate
+) -> Optional[schemas.Transaction]:
+    def update(session):
+        updated = crud.update_transaction(session, transaction_id, transaction)
+        return schemas.Transaction.model_validate(updated) if updated else None
+    return await _write(db, update)
+
+
+# ============== Snapshots ==============
+
+async def begin_snapshot(db: AsyncSession) -> None:
+    await db.run_sync(crud.begin_snapshot)
+
+
+# ============== Change Tracking ==============
+
+async def get_change_token(db: AsyncSession) -> int:
+    return await db.run_sync(crud.get_change_token)
+
+
+async def get_change_horizon(db: AsyncSession) -> int:
+    return await db.run_sync(crud.get_change_horizon)
+
+
+async def get_changes(db: AsyncSession, after: int = 0, limit: int = 500) -> Tuple[List[dict], bool]:
+    def query(session):
+        changes, has_more = crud.get_changes(session, after=after, limit=limit)
+        for change in changes:
+            if change["transaction"] is not None:
+                change["transaction"] = schemas.Transaction.model_validate(change["transaction"])
+        return changes, has_more
+    return await db.run_sync(query)
+
+
+async def get_changed_transactions(
+    db: AsyncSession, since: int, until: int
+) -> Tuple[List[schemas.Transaction], List[int]]:
+    def query(session):
+        transactions, deleted_ids = crud.get_changed_transactions(session, since=since, until=until)
+        return _transactions(transactions), deleted_ids
+    return await db.run_sync(query)
+
+
+# ============== Analytics Operations ==============
+
+async def get_analytics_summary(
+    db: AsyncSession,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    snapshot: bool = False,
+) -> schemas.AnalyticsSummary:
+    """
+    Get a summary, served from the analytics cache for whole-day ranges.
+
+    With snapshot set (after begin_snapshot) only a summary computed at the
+    snapshot's generation is served.
+    """
+    def query(session):
+        return crud.get_analytics_summary(session, start_date=start_date, end_date=end_date)
+
+    key = day_key(start_date, end_date)
+    if key is None:
+        summary_cache.bypassed += 1
+        return await db.run_sync(query)
+    # Read in the same database transaction as the summary, so the summary is
+    # at least as new as its generation
+    generation = await db.run_sync(_summary_generation)
+    return await summary_cache.get(key, generation, lambda: db.run_sync(query), exact=snapshot)
+
+
+def _summary_generation(session) -> Tuple[int, int]:
+    return crud.get_change_token(session), counters.read(session, VERSION_COUNTER)
@@ -0,0 +1,162 @@
+# Nearest-neighbour categorizer over hashed character n-grams of past transactions
+import os
+import threading
+import zlib
+from collections import OrderedDict, defaultdict
+from typing import List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # Optional: without it parse_transaction skips this step
+    np = None
+
+from sqlalchemy.orm import Session
+
+from . import models
+from .parse_cache import normalize
+
+# Distinct descriptions remembered per worker (4 KB each)
+CATEGORIZER_MAX_ENTRIES = int(os.getenv("CATEGORIZER_MAX_ENTRIES", "5000"))
+# Cosine similarity a neighbour needs for its category to be used
+CATEGORIZER_THRESHOLD = float(os.getenv("CATEGORIZER_THRESHOLD", "0.7"))
+# Similarity at which a past category also overrides a confident keyword rule
+CATEGORIZER_OVERRIDE_THRESHOLD = float(os.getenv("CATEGORIZER_OVERRIDE_THRESHOLD", "0.9"))
+
+DIMENSIONS = 1024
+
+
+def embed(text: str) -> "np.ndarray":
+    """
+    Hash the words and character trigrams of a normalized description into
+    a unit vector, so similar spellings ("uber eats #", "ubereats #") land
+    close together without a trained model.
+    """
+    vector = np.zeros(DIMENSIONS, dtype=np.float32)
+    padded = f" {text} "
+    features = text.split() + [padded[i:i + 3] for i in range(len(padded) - 2)]
+    for feature in features:
+        h = zlib.crc32(feature.encode())
+        # The top bit picks a sign so collisions cancel out instead of adding up
+        vector[h % DIMENSIONS] += 1.0 if h & 0x80000000 else -1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class NeighbourCategorizer:
+    """
+    Category decisions of saved transactions, as a matrix of description
+    vectors searched by cosine similarity.
+
+    Every create and update teaches it the transaction's final category, so
+    a user's correction is reused for similar descriptions without another
+    LLM call. One row per distinct normalized description; the oldest rows
+    are replaced once max_entries is reached.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = CATEGORIZER_MAX_ENTRIES,
+        threshold: float = CATEGORIZER_THRESHOLD,
+        k: int = 5,
+    ):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.k = k
+        self._lock = threading.Lock()
+        self._rows: "OrderedDict[str, int]" = OrderedDict()  # description -> matrix row, oldest first
+        self._labels: List[Tuple[str, str]] = []  # row -> (category, transaction_type)
+        self._matrix = np.zeros((0, DIMENSIONS), dtype=np.float32) if np is not None else None
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return np is not None
+
+    def load(self, db: Session) -> None:
+        """Learn from the most recent transactions in the database."""
+        if not self.enabled:
+            return
+        rows = db.query(
+            models.Transaction.description, models.Category.name, models.Transaction.transaction_type
+        ).join(models.Category).order_by(models.Transaction.id.desc()).limit(self.max_entries * 2).all()
+        # Oldest first, so the newest decision for a description wins
+        for description, category, transaction_type in reversed(rows):
+            self.learn(description, category, transaction_type)
+
+    def learn(self, description: str, category: str, transaction_type: str) -> None:
+        """Remember the category of a saved transaction's description."""
+        if not self.enabled:
+            return
+        key = normalize(description)
+        if not key:
+            return
+        vector = embed(key)
+        with self._lock:
+            row = self._rows.pop(key, None)
+            if row is None:
+                if len(self._rows) >= self.max_entries:
+                    _, row = self._rows.popitem(last=False)
+                else:
+                    row = len(self._rows)
+                    self._grow(row + 1)
+            self._matrix[row] = vector
+            if row < len(self._labels):
+                self._labels[row] = (category, transaction_type)
+            else:
+                self._labels.append((category, transaction_type))
+            self._rows[key] = row
+
+    def predict(self, description: str) -> Optional[Tuple[str, str, float]]:
+        """
+        Get (category, transaction_type, similarity) from the nearest saved
+        descriptions, or None if none is similar enough.
+
+        The k nearest rows above the threshold vote, weighted by similarity.
+        """
+        if not self.enabled:
+            return None
+        key = normalize(description)
+        vector = embed(key) if key else None
+        with self._lock:
+            count = len(self._rows)
+            if vector is None or count == 0:
+                self.misses += 1
+                return None
+            similarities = self._matrix[:count] @ vector
+            k = min(self.k, count)
+            nearest = np.argpartition(-similarities, k - 1)[:k]
+            nearest = nearest[similarities[nearest] >= self.threshold]
+            if len(nearest) == 0:
+                self.misses += 1
+                return None
+            votes = defaultdict(float)
+            for row in nearest:
+                votes[self._labels[row]] += float(similarities[row])
+            label = max(votes, key=votes.get)
+            similarity = max(float(similarities[row]) for row in nearest if self._labels[row] == label)
+            self.hits += 1
+        return label[0], label[1], similarity
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._rows),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+    def _grow(self, rows: int) -> None:
+        """Make room for at least `rows` rows, doubling the matrix (caller holds the lock)."""
+        capacity = len(self._matrix)
+        if rows <= capacity:
+            return
+        matrix = np.zeros((min(self.max_entries, max(256, capacity * 2)), DIMENSIONS), dtype=np.float32)
+        matrix[:capacity] = self._matrix
+        self._matrix = matrix
+
+
+categorizer = NeighbourCategorizer()
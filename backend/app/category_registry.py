@@ -0,0 +1,70 @@
+# In-process category cache with write-through updates
+import threading
+from typing import Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from . import models, schemas, counters
+
+VERSION_COUNTER = "categories"
+
+
+class CategoryRegistry:
+    """
+    Versioned in-memory copy of the categories table.
+
+    Every lookup compares the cached version with the shared counter in the
+    database (a single primary-key read) and reloads when another worker has
+    changed categories, so new categories are visible within one request.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_id: Dict[int, schemas.Category] = {}
+        self.version: Optional[int] = None
+
+    def load(self, db: Session) -> None:
+        """Reload all categories from the database."""
+        # Query outside the lock: under AsyncSession.run_sync another request on
+        # the same thread can run while this one waits on the database
+        version = counters.read(db, VERSION_COUNTER)
+        by_id = {
+            c.id: schemas.Category.model_validate(c)
+            for c in db.query(models.Category).order_by(models.Category.id)
+        }
+        with self._lock:
+            if self.version is None or version >= self.version:
+                self._by_id = by_id
+                self.version = version
+
+    def refresh(self, db: Session) -> None:
+        """Reload if categories changed since the last load."""
+        if self.version is None or counters.read(db, VERSION_COUNTER) != self.version:
+            self.load(db)
+
+    def get(self, db: Session, category_id: int) -> Optional[schemas.Category]:
+        self.refresh(db)
+        return self._by_id.get(category_id)
+
+    def all(self, db: Session) -> List[schemas.Category]:
+        self.refresh(db)
+        return list(self._by_id.values())
+
+    def by_id(self, db: Session) -> Dict[int, schemas.Category]:
+        self.refresh(db)
+        return self._by_id
+
+    def add(self, db: Session, category: models.Category, version: int) -> None:
+        """Write through a committed category created at the given counter version."""
+        with self._lock:
+            if self.version is not None and version == self.version + 1:
+                by_id = dict(self._by_id)
+                by_id[category.id] = schemas.Category.model_validate(category)
+                self._by_id = by_id
+                self.version = version
+                return
+        # Another worker changed categories in between; fall back to a full load
+        self.load(db)
+
+
+registry = CategoryRegistry()
@@ -0,0 +1,40 @@
+# Shared version counters stored in the database
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from . import models
+
+
+def read(db: Session, name: str) -> int:
+    """Get the current value of a counter (0 if it was never bumped)."""
+    value = db.query(models.VersionCounter.value).filter(models.VersionCounter.name == name).scalar()
+    return value or 0
+
+
+def bump(db: Session, name: str, by: int = 1) -> int:
+    """Increment a counter inside the caller's transaction and return the new value."""
+    value = db.execute(
+        update(models.VersionCounter)
+        .where(models.VersionCounter.name == name)
+        .values(value=models.VersionCounter.value + by)
+        .returning(models.VersionCounter.value)
+    ).scalar()
+    if value is None:
+        db.add(models.VersionCounter(name=name, value=by))
+        db.flush()
+        return by
+    return value
+
+
+def raise_to(db: Session, name: str, value: int) -> None:
+    """Set a counter to value unless it is already higher (caller commits)."""
+    if read(db, name) >= value:
+        return
+    result = db.execute(
+        update(models.VersionCounter)
+        .where(models.VersionCounter.name == name)
+        .values(value=value)
+    )
+    if result.rowcount == 0:
+        db.add(models.VersionCounter(name=name, value=value))
+        db.flush()
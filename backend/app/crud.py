@@ -1,29 +1,35 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from typing import List, Optional
-from datetime import datetime
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import and_, func, insert, or_
+from typing import List, Optional, Tuple
+from datetime import datetime, timedelta
+import base64
+import json
 
-from . import models, schemas
+from . import models, schemas, rollups, counters
+from .categorizer import categorizer
+from .category_registry import registry as category_registry, VERSION_COUNTER
 
 
 # ============== Category Operations ==============
 
-def get_categories(db: Session) -> List[models.Category]:
-    """Get all categories."""
-    return db.query(models.Category).all()
+def get_categories(db: Session) -> List[schemas.Category]:
+    """Get all categories (served from the category registry)."""
+    return category_registry.all(db)
 
 
-def get_category(db: Session, category_id: int) -> Optional[models.Category]:
-    """Get a single category by ID."""
-    return db.query(models.Category).filter(models.Category.id == category_id).first()
+def get_category(db: Session, category_id: int) -> Optional[schemas.Category]:
+    """Get a single category by ID (served from the category registry)."""
+    return category_registry.get(db, category_id)
 
 
 def create_category(db: Session, category: schemas.CategoryCreate) -> models.Category:
     """Create a new category."""
     db_category = models.Category(**category.model_dump())
     db.add(db_category)
+    version = counters.bump(db, VERSION_COUNTER)
     db.commit()
     db.refresh(db_category)
+    category_registry.add(db, db_category, version)
     return db_category
 
 
@@ -42,6 +48,7 @@ def create_default_categories(db: Session) -> None:
         ]
         for cat in default_categories:
             db.add(models.Category(**cat))
+        counters.bump(db, VERSION_COUNTER)
         db.commit()
 
 
@@ -56,7 +63,8 @@ def get_transactions(
     end_date: Optional[datetime] = None,
 ) -> List[models.Transaction]:
     """Get transactions with optional filtering."""
-    query = db.query(models.Transaction)
+    # Load categories in the same query so serialization doesn't lazy-load them
+    query = db.query(models.Transaction).options(joinedload(models.Transaction.category))
     
     if category_id:
         query = query.filter(models.Transaction.category_id == category_id)
@@ -68,24 +76,149 @@ def get_transactions(
     return query.order_by(models.Transaction.date.desc()).offset(skip).limit(limit).all()
 
 
+def get_transactions_page(
+    db: Session,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    category_id: Optional[int] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+) -> Tuple[List[models.Transaction], Optional[str], Optional[str]]:
+    """
+    Get one page of transactions using keyset pagination on (date, id).
+
+    Returns the page plus opaque cursors for the next (older) and previous
+    (newer) pages. Raises ValueError for a malformed cursor.
+    """
+    query = db.query(models.Transaction).options(joinedload(models.Transaction.category))
+    
+    if category_id:
+        query = query.filter(models.Transaction.category_id == category_id)
+    if start_date:
+        query = query.filter(models.Transaction.date >= start_date)
+    if end_date:
+        query = query.filter(models.Transaction.date <= end_date)
+    
+    backward = False
+    if cursor:
+        key_date, key_id, backward = _decode_cursor(cursor)
+        if backward:
+            # Rows newer than the boundary, nearest first
+            query = query.filter(
+                models.Transaction.date >= key_date,
+                or_(
+                    models.Transaction.date > key_date,
+                    and_(models.Transaction.date == key_date, models.Transaction.id > key_id),
+                ),
+            ).order_by(models.Transaction.date.asc(), models.Transaction.id.asc())
+        else:
+            query = query.filter(
+                models.Transaction.date <= key_date,
+                or_(
+                    models.Transaction.date < key_date,
+                    and_(models.Transaction.date == key_date, models.Transaction.id < key_id),
+                ),
+            )
+    if not backward:
+        query = query.order_by(models.Transaction.date.desc(), models.Transaction.id.desc())
+    
+    # Fetch one extra row to learn whether another page exists in this direction
+    rows = query.limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if backward:
+        rows.reverse()
+    
+    if not rows:
+        return rows, None, None
+    has_next = has_more if not backward else True
+    has_prev = has_more if backward else cursor is not None
+    next_cursor = _encode_cursor(rows[-1], backward=False) if has_next else None
+    prev_cursor = _encode_cursor(rows[0], backward=True) if has_prev else None
+    return rows, next_cursor, prev_cursor
+
+
+def _encode_cursor(transaction: models.Transaction, backward: bool) -> str:
+    payload = {"d": transaction.date.isoformat(), "i": transaction.id, "b": backward}
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, int, bool]:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(payload["d"]), int(payload["i"]), bool(payload["b"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
 def get_transaction(db: Session, transaction_id: int) -> Optional[models.Transaction]:
     """Get a single transaction by ID."""
-    return db.query(models.Transaction).filter(models.Transaction.id == transaction_id).first()
+    return (
+        db.query(models.Transaction)
+        .options(joinedload(models.Transaction.category))
+        .filter(models.Transaction.id == transaction_id)
+        .first()
+    )
+
+
+def _transaction_columns(transaction: schemas.TransactionCreate) -> dict:
+    """Column values for a new transaction row, with the amount in cents."""
+    return {**transaction.model_dump(exclude={"amount"}), "amount_cents": transaction.amount_cents}
 
 
 def create_transaction(db: Session, transaction: schemas.TransactionCreate) -> models.Transaction:
     """Create a new transaction."""
-    db_transaction = models.Transaction(**transaction.model_dump())
+    db_transaction = models.Transaction(**_transaction_columns(transaction))
     db.add(db_transaction)
+    db.flush()
+    transaction_id = db_transaction.id
+    _log_change(db, transaction_id, "create")
+    rollups.apply(db, rollups.collect([db_transaction], +1))
     db.commit()
-    db.refresh(db_transaction)
+    db_transaction = _reload_transaction(db, transaction_id)
+    _learn_category(db, db_transaction)
     return db_transaction
 
 
+def bulk_create_transactions(db: Session, transactions: List[schemas.TransactionCreate]) -> List[int]:
+    """
+    Insert many transactions in one database transaction and return their IDs in input order.
+    
+    Categories must already have been validated by the caller.
+    """
+    if not transactions:
+        return []
+    rows = [_transaction_columns(t) for t in transactions]
+    if db.get_bind().dialect.name == "sqlite":
+        # Ordered RETURNING costs SQLite one statement per row. A plain
+        # executemany under this transaction's write lock assigns consecutive
+        # rowids, so the IDs follow from the highest one
+        db.execute(insert(models.Transaction), rows)
+        last_id = db.scalar(func.max(models.Transaction.id).select())
+        ids = list(range(last_id - len(rows) + 1, last_id + 1))
+    else:
+        ids = db.scalars(
+            insert(models.Transaction).returning(models.Transaction.id, sort_by_parameter_order=True),
+            rows,
+        ).all()
+    last_seq = counters.bump(db, CHANGES_COUNTER, by=len(ids))
+    db.execute(
+        insert(models.TransactionChange),
+        [
+            {"seq": last_seq - len(ids) + i, "transaction_id": transaction_id, "op": "create"}
+            for i, transaction_id in enumerate(ids, start=1)
+        ],
+    )
+    rollups.apply(db, rollups.collect(transactions, +1))
+    db.commit()
+    return list(ids)
+
+
 def delete_transaction(db: Session, transaction_id: int) -> bool:
     """Delete a transaction by ID."""
-    transaction = get_transaction(db, transaction_id)
+    transaction = _lock_transaction(db, transaction_id, "delete")
     if transaction:
+        rollups.apply(db, rollups.collect([transaction], -1))
         db.delete(transaction)
         db.commit()
         return True
@@ -94,18 +227,218 @@ def delete_transaction(db: Session, transaction_id: int) -> bool:
 
 def update_transaction(db: Session, transaction_id: int, transaction: schemas.TransactionCreate) -> models.Transaction:
     """Update an existing transaction."""
-    db_transaction = get_transaction(db, transaction_id)
+    db_transaction = _lock_transaction(db, transaction_id, "update")
     if db_transaction:
-        db_transaction.amount = transaction.amount
+        # Move the old amount out of its rollup bucket and the new one in
+        deltas = rollups.collect([db_transaction], -1)
+        db_transaction.amount_cents = transaction.amount_cents
         db_transaction.description = transaction.description
         db_transaction.transaction_type = transaction.transaction_type
         db_transaction.date = transaction.date
         db_transaction.category_id = transaction.category_id
+        rollups.apply(db, rollups.collect([db_transaction], +1, deltas))
         db.commit()
-        db.refresh(db_transaction)
+        db_transaction = _reload_transaction(db, transaction_id)
+        _learn_category(db, db_transaction)
     return db_transaction
 
 
+def _reload_transaction(db: Session, transaction_id: int) -> models.Transaction:
+    """
+    Re-read a committed transaction with its category loaded, so converting
+    it to a schema issues no lazy load (see async_crud).
+    """
+    return (
+        db.query(models.Transaction)
+        .options(joinedload(models.Transaction.category))
+        .filter(models.Transaction.id == transaction_id)
+        .populate_existing()
+        .one()
+    )
+
+
+def _lock_transaction(db: Session, transaction_id: int, op: str) -> Optional[models.Transaction]:
+    """
+    Log a write to a transaction and get its current row, locked until the
+    caller commits. Rolls back and returns None if it doesn't exist.
+
+    The change is logged before the row is read: SQLite ignores FOR UPDATE
+    and pysqlite opens no transaction for a SELECT, so the log's counter bump
+    is what takes the write lock. The row is reloaded even if the session
+    already holds it, since the old values feed the rollup deltas.
+    """
+    _log_change(db, transaction_id, op)
+    db.flush()
+    transaction = (
+        db.query(models.Transaction)
+        .options(joinedload(models.Transaction.category))
+        .filter(models.Transaction.id == transaction_id)
+        .with_for_update(of=models.Transaction)
+        .populate_existing()
+        .first()
+    )
+    if transaction is None:
+        db.rollback()
+    return transaction
+
+
+def _learn_category(db: Session, transaction: models.Transaction) -> None:
+    """Teach the nearest-neighbour categorizer the category a transaction was saved with."""
+    if not categorizer.enabled:
+        return
+    category = category_registry.get(db, transaction.category_id)
+    if category is not None:
+        categorizer.learn(transaction.description, category.name, transaction.transaction_type)
+
+
+# ============== Change Tracking ==============
+
+# Last seq handed out. Bumping it locks the counter row until the writer
+# commits, so seqs become visible in commit order and a reader that has seen
+# seq n never misses a smaller one committed later. Writers bump it before
+# touching rollup buckets, which keeps the lock order the same everywhere.
+CHANGES_COUNTER = "changes"
+
+# Highest seq removed by retention; clients behind it must do a full resync
+CHANGE_HORIZON_COUNTER = "changes_horizon"
+
+
+def _log_change(db: Session, transaction_id: int, op: str) -> None:
+    """Record a transaction write in the change log (caller commits)."""
+    db.add(models.TransactionChange(seq=counters.bump(db, CHANGES_COUNTER), transaction_id=transaction_id, op=op))
+
+
+def begin_snapshot(db: Session) -> None:
+    """
+    Start a read-only transaction in which every query sees the same
+    committed state. Must be called before the session's first query.
+    """
+    if db.get_bind().dialect.name == "sqlite":
+        # pysqlite only opens transactions for writes, so each SELECT would
+        # otherwise see the latest commit; a WAL read transaction keeps its
+        # snapshot from the first read until it ends
+        db.connection().exec_driver_sql("BEGIN")
+    else:
+        db.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+
+
+def get_change_token(db: Session) -> int:
+    """Get the seq of the latest committed change (0 if nothing has changed yet)."""
+    return max(counters.read(db, CHANGES_COUNTER), get_change_horizon(db))
+
+
+def get_change_horizon(db: Session) -> int:
+    """Get the oldest seq a client can resume from without missing changes."""
+    return counters.read(db, CHANGE_HORIZON_COUNTER)
+
+
+def get_changes(db: Session, after: int = 0, limit: int = 500) -> Tuple[List[dict], bool]:
+    """
+    Get up to limit logged changes with seq > after, in seq order.
+    
+    Each change carries the current transaction row, or None for deletes
+    (tombstones) and for rows deleted later in the log. Also returns whether
+    more changes follow.
+    """
+    changes = (
+        db.query(models.TransactionChange)
+        .filter(models.TransactionChange.seq > after)
+        .order_by(models.TransactionChange.seq)
+        .limit(limit + 1)
+        .all()
+    )
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+    
+    live_ids = {c.transaction_id for c in changes if c.op != "delete"}
+    transactions = {}
+    if live_ids:
+        transactions = {
+            t.id: t
+            for t in db.query(models.Transaction)
+            .options(joinedload(models.Transaction.category))
+            .filter(models.Transaction.id.in_(live_ids))
+        }
+    
+    return [
+        {
+            "seq": c.seq,
+            "op": c.op,
+            "transaction_id": c.transaction_id,
+            "changed_at": c.changed_at,
+            "transaction": transactions.get(c.transaction_id) if c.op != "delete" else None,
+        }
+        for c in changes
+    ], has_more
+
+
+def compact_changes(db: Session, retention_days: int) -> Tuple[int, int]:
+    """
+    Compact the change log and apply retention.
+    
+    Keeps only the latest change per transaction, then drops changes older
+    than retention_days and moves the resync horizon past them. Returns the
+    number of (superseded, expired) entries removed.
+    """
+    latest_per_transaction = (
+        db.query(func.max(models.TransactionChange.seq))
+        .group_by(models.TransactionChange.transaction_id)
+    )
+    superseded = (
+        db.query(models.TransactionChange)
+        .filter(models.TransactionChange.seq.notin_(latest_per_transaction))
+        .delete(synchronize_session=False)
+    )
+    
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    expired_upto = (
+        db.query(func.max(models.TransactionChange.seq))
+        .filter(models.TransactionChange.changed_at < cutoff)
+        .scalar()
+    )
+    expired = 0
+    if expired_upto:
+        counters.raise_to(db, CHANGE_HORIZON_COUNTER, expired_upto)
+        expired = (
+            db.query(models.TransactionChange)
+            .filter(models.TransactionChange.seq <= expired_upto)
+            .delete(synchronize_session=False)
+        )
+    db.commit()
+    return superseded, expired
+
+
+def get_changed_transactions(
+    db: Session,
+    since: int,
+    until: int,
+) -> Tuple[List[models.Transaction], List[int]]:
+    """
+    Get transactions written in the change window (since, until].
+
+    Returns the current rows of created/updated transactions and the IDs of
+    those that no longer exist.
+    """
+    changed_ids = {
+        transaction_id
+        for (transaction_id,) in db.query(models.TransactionChange.transaction_id)
+        .filter(models.TransactionChange.seq > since, models.TransactionChange.seq <= until)
+        .distinct()
+    }
+    if not changed_ids:
+        return [], []
+    
+    transactions = (
+        db.query(models.Transaction)
+        .options(joinedload(models.Transaction.category))
+        .filter(models.Transaction.id.in_(changed_ids))
+        .order_by(models.Transaction.date.desc(), models.Transaction.id.desc())
+        .all()
+    )
+    deleted_ids = sorted(changed_ids - {t.id for t in transactions})
+    return transactions, deleted_ids
+
+
 # ============== Analytics Operations ==============
 
 def get_analytics_summary(
@@ -114,39 +447,29 @@ def get_analytics_summary(
     end_date: Optional[datetime] = None,
 ) -> schemas.AnalyticsSummary:
     """Get spending analytics summary."""
-    query = db.query(models.Transaction)
-    
-    if start_date:
-        query = query.filter(models.Transaction.date >= start_date)
-    if end_date:
-        query = query.filter(models.Transaction.date <= end_date)
-    
-    transactions = query.all()
-    
-    # Calculate totals
-    total_income = sum(t.amount for t in transactions if t.transaction_type == "income")
-    total_expenses = sum(t.amount for t in transactions if t.transaction_type == "expense")
-    
-    # Calculate by category (expenses only)
-    category_totals = {}
-    for t in transactions:
-        if t.transaction_type == "expense":
-            cat_name = t.category.name
-            cat_color = t.category.color
-            if cat_name not in category_totals:
-                category_totals[cat_name] = {"color": cat_color, "total": 0, "count": 0}
-            category_totals[cat_name]["total"] += t.amount
-            category_totals[cat_name]["count"] += 1
+    # Served from the rollups; only partial days at the edges touch raw rows
+    rows = rollups.summary_rows(db, start_date=start_date, end_date=end_date)
+    return _build_summary(rows, category_registry.by_id(db))
+
+
+def _build_summary(rows, categories) -> schemas.AnalyticsSummary:
+    """Build an AnalyticsSummary from (type, category_id, total cents, count) rows."""
+    # Calculate totals (exact integer cents)
+    total_income = sum(total for t_type, _, total, _ in rows if t_type == "income")
+    total_expenses = sum(total for t_type, _, total, _ in rows if t_type == "expense")
     
-    # Build category summaries with percentages
+    # Build category summaries with percentages (expenses only)
     by_category = []
-    for name, data in category_totals.items():
-        percentage = (data["total"] / total_expenses * 100) if total_expenses > 0 else 0
+    for t_type, category_id, total, count in rows:
+        if t_type != "expense":
+            continue
+        category = categories[category_id]
+        percentage = (total / total_expenses * 100) if total_expenses > 0 else 0
         by_category.append(schemas.CategorySummary(
-            category_name=name,
-            category_color=data["color"],
-            total=round(data["total"], 2),
-            count=data["count"],
+            category_name=category.name,
+            category_color=category.color,
+            total=schemas.from_cents(total),
+            count=count,
             percentage=round(percentage, 1),
         ))
     
@@ -154,8 +477,8 @@ def get_analytics_summary(
     by_category.sort(key=lambda x: x.total, reverse=True)
     
     return schemas.AnalyticsSummary(
-        total_income=round(total_income, 2),
-        total_expenses=round(total_expenses, 2),
-        net_balance=round(total_income - total_expenses, 2),
+        total_income=schemas.from_cents(total_income),
+        total_expenses=schemas.from_cents(total_expenses),
+        net_balance=schemas.from_cents(total_income - total_expenses),
         by_category=by_category,
     )
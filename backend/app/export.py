@@ -0,0 +1,230 @@
+# Streaming ledger export straight from row tuples
+import csv
+import glob
+import io
+import json
+import os
+import tempfile
+import time
+import zipfile
+from datetime import datetime
+from typing import Iterator, Optional
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Optional: only needed for Arrow/Parquet exports
+    pa = pq = None
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from . import models, schemas
+from .database import engine
+
+# Rows fetched from the cursor (and written to the response) per chunk
+CHUNK_SIZE = 2000
+
+# Columnar exports are cached here, keyed by the ledger's change token
+CACHE_DIR = os.getenv("EXPORT_CACHE_DIR", os.path.join(tempfile.gettempdir(), "nonna-exports"))
+
+COLUMNS = ["id", "date", "amount", "description", "transaction_type", "category_id", "category_name", "created_at"]
+
+# Seconds an export of an older ledger version is kept after it was last
+# served, so a response that is about to open it doesn't find it gone
+STALE_EXPORT_GRACE = int(os.getenv("EXPORT_STALE_GRACE", "300"))
+
+# Bumped when the columnar layout changes, so cached files of the old layout are not reused
+COLUMNAR_LAYOUT_VERSION = 2
+
+
+def _rows(
+    category_id: Optional[int] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+) -> Iterator[list]:
+    """Yield lists of row tuples from a server-side cursor, using a dedicated session."""
+    query = (
+        select(
+            models.Transaction.id,
+            models.Transaction.date,
+            models.Transaction.amount_cents,
+            models.Transaction.description,
+            models.Transaction.transaction_type,
+            models.Transaction.category_id,
+            models.Category.name,
+            models.Transaction.created_at,
+        )
+        .join(models.Category, models.Transaction.category_id == models.Category.id)
+        .order_by(models.Transaction.date.desc(), models.Transaction.id.desc())
+        .execution_options(yield_per=CHUNK_SIZE)
+    )
+    if category_id:
+        query = query.where(models.Transaction.category_id == category_id)
+    if start_date:
+        query = query.where(models.Transaction.date >= start_date)
+    if end_date:
+        query = query.where(models.Transaction.date <= end_date)
+
+    # The request's session is closed before a streamed body is sent
+    db = Session(bind=engine)
+    try:
+        for partition in db.execute(query).partitions():
+            yield partition
+    finally:
+        db.close()
+
+
+def _isoformat(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value is not None else None
+
+
+def ndjson(**filters) -> Iterator[str]:
+    """Stream the ledger as newline-delimited JSON objects."""
+    for partition in _rows(**filters):
+        yield "".join(
+            json.dumps({
+                "id": t_id,
+                "date": _isoformat(date),
+                "amount": schemas.from_cents(amount_cents),
+                "description": description,
+                "transaction_type": t_type,
+                "category_id": category_id,
+                "category_name": category_name,
+                "created_at": _isoformat(created_at),
+            }) + "\n"
+            for t_id, date, amount_cents, description, t_type, category_id, category_name, created_at in partition
+        )
+
+
+def csv_text(**filters) -> Iterator[str]:
+    """Stream the ledger as CSV with a header row."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    for partition in _rows(**filters):
+        writer.writerows(
+            (t_id, _isoformat(date), schemas.from_cents(amount_cents), description, t_type, category_id,
+             category_name, _isoformat(created_at))
+            for t_id, date, amount_cents, description, t_type, category_id, category_name, created_at in partition
+        )
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+# ============== Columnar Export ==============
+
+def _arrow_schema():
+    return pa.schema([
+        ("id", pa.int64()),
+        ("date", pa.timestamp("us")),
+        ("amount_cents", pa.int64()),  # Exact; divide by 100 for the amount
+        ("description", pa.string()),
+        ("transaction_type", pa.string()),
+        ("category_id", pa.int64()),
+        ("category_name", pa.string()),
+        ("created_at", pa.timestamp("us")),
+    ])
+
+
+def columnar_file(file_format: str, by_month: bool, change_token: int, categories_version: int) -> str:
+    """
+    Get the path of an Arrow IPC or Parquet export of the full ledger.
+    
+    Files are built batch by batch from the DB cursor and cached on disk by
+    change token, so exporting an unchanged ledger again just reuses the file.
+    Arrow files are uncompressed IPC and can be memory-mapped. With by_month
+    the export is a zip of one file per month.
+    """
+    if pa is None:
+        raise RuntimeError("pyarrow is not installed")
+    
+    extension = "arrow" if file_format == "arrow" else "parquet"
+    shape = f"{extension}-monthly.zip" if by_month else extension
+    path = os.path.join(
+        CACHE_DIR, f"ledger-v{COLUMNAR_LAYOUT_VERSION}-{change_token}-{categories_version}.{shape}"
+    )
+    try:
+        os.utime(path)  # Mark as served, see _remove_stale
+        return path
+    except FileNotFoundError:
+        pass
+    
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, suffix=".tmp")
+    os.close(fd)
+    try:
+        if by_month:
+            _write_monthly_zip(tmp_path, extension)
+        else:
+            _write_columnar(tmp_path, extension, _record_batches())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    
+    _remove_stale(shape, keep=path)
+    return path
+
+
+def _remove_stale(shape: str, keep: str) -> None:
+    """Drop exports of older ledger versions in the same shape that nobody was served recently."""
+    cutoff = time.time() - STALE_EXPORT_GRACE
+    for stale in glob.glob(os.path.join(CACHE_DIR, f"ledger-*.{shape}")):
+        if stale == keep:
+            continue
+        try:
+            if os.path.getmtime(stale) < cutoff:
+                os.remove(stale)
+        except FileNotFoundError:
+            pass  # Removed by another worker
+
+
+def _record_batches() -> Iterator["pa.RecordBatch"]:
+    schema = _arrow_schema()
+    for partition in _rows():
+        yield pa.RecordBatch.from_arrays(
+            [pa.array(column, type=field.type) for column, field in zip(zip(*partition), schema)],
+            schema=schema,
+        )
+
+
+def _write_columnar(path: str, extension: str, batches) -> None:
+    schema = _arrow_schema()
+    if extension == "arrow":
+        with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(sink, schema) as writer:
+            for batch in batches:
+                writer.write_batch(batch)
+    else:
+        with pq.ParquetWriter(path, schema) as writer:
+            for batch in batches:
+                writer.write_batch(batch)
+
+
+def _write_monthly_zip(path: str, extension: str) -> None:
+    """Write one file per month (rows arrive newest first, so months are contiguous)."""
+    with tempfile.TemporaryDirectory(dir=CACHE_DIR) as parts_dir, \
+            zipfile.ZipFile(path, "w", compression=zipfile.ZIP_STORED) as archive:
+        month, batches = None, []
+        
+        def flush():
+            if month is not None:
+                part = os.path.join(parts_dir, f"month={month}.{extension}")
+                _write_columnar(part, extension, batches)
+                archive.write(part, os.path.basename(part))
+                os.remove(part)
+        
+        for batch in _record_batches():
+            months = [d.strftime("%Y-%m") for d in batch.column("date").to_pylist()]
+            start = 0
+            for i in range(1, len(months) + 1):
+                if i == len(months) or months[i] != months[start]:
+                    if months[start] != month:
+                        flush()
+                        month, batches = months[start], []
+                    batches.append(batch.slice(start, i - start))
+                    start = i
+        flush()
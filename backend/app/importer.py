@@ -0,0 +1,276 @@
+# Streaming CSV / OFX statement import
+import asyncio
+import csv
+import os
+import re
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from . import ai_parser, crud, rule_parser, schemas
+from .category_registry import registry as category_registry
+from .database import engine
+
+# Rows categorized and committed together
+BATCH_SIZE = 500
+# Row errors kept on a job (the count is always exact)
+MAX_REPORTED_ERRORS = 50
+# Seconds a finished job's progress stays available
+IMPORT_JOB_TTL = int(os.getenv("IMPORT_JOB_TTL", "3600"))
+
+_DATE_FORMATS = ["%Y-%m-%d", "%m/%d/%Y", "%m/%d/%y", "%d/%m/%Y", "%Y/%m/%d", "%d.%m.%Y"]
+_OFX_TAG = re.compile(r"<(\w+)>([^<\r\n]*)")
+
+# Parsed statement row: (line number, date, description, signed amount)
+Row = Tuple[int, datetime, str, float]
+
+
+class ImportJob:
+    """Progress of one import, shared between the worker task and the progress endpoint."""
+
+    def __init__(self, filename: str, file_format: str):
+        self.id = uuid.uuid4().hex
+        self.filename = filename
+        self.format = file_format
+        self.status = "pending"  # pending, running, done or failed
+        self.rows_read = 0
+        self.created = 0
+        self.failed = 0
+        self.llm_categorized = 0
+        self.errors: List[str] = []
+        self.started_at = datetime.utcnow()
+        self.finished_at: Optional[datetime] = None
+
+    def add_error(self, message: str) -> None:
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(message)
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "filename": self.filename,
+            "format": self.format,
+            "status": self.status,
+            "rows_read": self.rows_read,
+            "created": self.created,
+            "failed": self.failed,
+            "llm_categorized": self.llm_categorized,
+            "errors": list(self.errors),
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+# Jobs live in the memory of the worker that accepted the upload; with several
+# workers, progress requests must reach that same worker (sticky sessions)
+_jobs: Dict[str, ImportJob] = {}
+_jobs_lock = threading.Lock()
+
+
+def create_job(filename: str, file_format: str) -> ImportJob:
+    job = ImportJob(filename, file_format)
+    with _jobs_lock:
+        _evict_finished()
+        _jobs[job.id] = job
+    return job
+
+
+def get_job(job_id: str) -> Optional[ImportJob]:
+    with _jobs_lock:
+        _evict_finished()
+        return _jobs.get(job_id)
+
+
+def _evict_finished() -> None:
+    """Drop jobs that finished more than IMPORT_JOB_TTL seconds ago. Call with _jobs_lock held."""
+    cutoff = datetime.utcnow() - timedelta(seconds=IMPORT_JOB_TTL)
+    for job_id in [i for i, job in _jobs.items() if job.finished_at and job.finished_at < cutoff]:
+        del _jobs[job_id]
+
+
+# ============== Import Pipeline ==============
+
+async def run_import(job: ImportJob, path: str, profile: schemas.ImportProfile) -> None:
+    """Stream rows from a spooled upload, categorize them and insert them in batches."""
+    job.status = "running"
+    try:
+        with open(path, "r", encoding="utf-8-sig", newline="") as f:
+            rows = _read_csv(f, profile, job) if job.format == "csv" else _read_ofx(f, job)
+            while True:
+                batch = await asyncio.to_thread(_next_batch, rows)
+                if not batch:
+                    break
+                await _import_batch(job, batch)
+        job.status = "done"
+    except Exception as e:
+        job.status = "failed"
+        job.errors.append(f"Import aborted: {e}")
+    finally:
+        job.finished_at = datetime.utcnow()
+        os.remove(path)
+
+
+def _next_batch(rows: Iterator[Row]) -> List[Row]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BATCH_SIZE:
+            break
+    return batch
+
+
+async def _import_batch(job: ImportJob, batch: List[Row]) -> None:
+    # Local keyword rules first; only unknown expenses go to the parser's LLM
+    # path (income is always filed under "Income")
+    categories = [rule_parser.categorize(description) for _, _, description, _ in batch]
+    unknown = [i for i, category in enumerate(categories) if category is None and batch[i][3] < 0]
+    if unknown:
+        parsed = await ai_parser.parse_batch([
+            f"{batch[i][2]} {abs(batch[i][3]):.2f}" for i in unknown
+        ])
+        for i, result in zip(unknown, parsed):
+            if result["success"]:
+                categories[i] = result["data"]["category"]
+                if result["data"].get("source") == "llm":
+                    job.llm_categorized += 1
+
+    category_ids = await asyncio.to_thread(_category_ids_by_name)
+    transactions = []
+    for (line, date, description, amount), category in zip(batch, categories):
+        transaction_type = "income" if amount > 0 else "expense"
+        if transaction_type == "income":
+            category = "Income"
+        try:
+            transactions.append(schemas.TransactionCreate(
+                amount=abs(amount),
+                description=description[:255],
+                transaction_type=transaction_type,
+                date=date,
+                category_id=category_ids.get(category, category_ids.get("Other")),
+            ))
+        except ValueError as e:
+            job.add_error(f"Row {line}: {e}")
+
+    created = await asyncio.to_thread(_insert, transactions)
+    job.created += created
+
+
+def _insert(transactions: List[schemas.TransactionCreate]) -> int:
+    db = Session(bind=engine)
+    try:
+        return len(crud.bulk_create_transactions(db, transactions))
+    finally:
+        db.close()
+
+
+def _category_ids_by_name() -> Dict[str, int]:
+    db = Session(bind=engine)
+    try:
+        return {c.name: c.id for c in category_registry.all(db)}
+    finally:
+        db.close()
+
+
+# ============== Readers ==============
+
+def _read_csv(f, profile: schemas.ImportProfile, job: ImportJob) -> Iterator[Row]:
+    reader = csv.DictReader(f, delimiter=profile.delimiter)
+    for record in reader:
+        job.rows_read += 1
+        line = reader.line_num
+        try:
+            date_value = _field(record, profile.date_column)
+            if not date_value:
+                raise ValueError(f"missing {profile.date_column}")
+            date = _parse_date(date_value, profile.date_format)
+            description = " ".join(
+                _field(record, c).strip() for c in profile.description_columns if _field(record, c).strip()
+            )
+            if profile.amount_column:
+                amount_value = _field(record, profile.amount_column)
+                if not amount_value.strip():
+                    raise ValueError(f"missing {profile.amount_column}")
+                amount = _parse_amount(amount_value)
+                if profile.expenses_positive:
+                    amount = -amount
+            else:
+                amount = (_parse_amount(_field(record, profile.credit_column))
+                          - _parse_amount(_field(record, profile.debit_column)))
+        except Exception as e:
+            # A malformed row is reported and skipped; it never aborts the import
+            job.add_error(f"Row {line}: {e}")
+            continue
+        if not description or amount == 0:
+            job.add_error(f"Row {line}: missing description or zero amount")
+            continue
+        yield line, date, description, amount
+
+
+def _field(record: dict, column: Optional[str]) -> str:
+    """Get a column's value, or "" if the column is unset or missing from a short row (DictReader gives None)."""
+    return (record.get(column) or "") if column else ""
+
+
+def _read_ofx(f, job: ImportJob) -> Iterator[Row]:
+    """Yield <STMTTRN> records from SGML or XML OFX, reading the file in chunks."""
+    buffer = ""
+    number = 0
+    while True:
+        chunk = f.read(64 * 1024)
+        buffer += chunk.replace("\r", "")
+        while True:
+            start = buffer.find("<STMTTRN>")
+            if start == -1:
+                # Keep a tail in case the opening tag is split across chunks
+                buffer = buffer[-16:]
+                break
+            end = buffer.find("</STMTTRN>", start)
+            if end == -1:
+                buffer = buffer[start:]
+                break
+            block, buffer = buffer[start:end], buffer[end + len("</STMTTRN>"):]
+            number += 1
+            job.rows_read += 1
+            fields = {tag.upper(): value.strip() for tag, value in _OFX_TAG.findall(block)}
+            try:
+                date = datetime.strptime(fields["DTPOSTED"][:8], "%Y%m%d")
+                amount = float(fields["TRNAMT"].replace(",", "."))
+            except (KeyError, ValueError) as e:
+                job.add_error(f"Transaction {number}: {e}")
+                continue
+            description = " ".join(v for v in (fields.get("NAME"), fields.get("MEMO")) if v)
+            if not description or amount == 0:
+                job.add_error(f"Transaction {number}: missing description or zero amount")
+                continue
+            yield number, date, description, amount
+        if not chunk:
+            return
+
+
+def _parse_date(value: str, date_format: Optional[str]) -> datetime:
+    value = value.strip()
+    if date_format:
+        return datetime.strptime(value, date_format)
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        pass
+    for candidate in _DATE_FORMATS:
+        try:
+            return datetime.strptime(value, candidate)
+        except ValueError:
+            continue
+    raise ValueError(f"Unrecognized date {value!r}")
+
+
+def _parse_amount(value: str) -> float:
+    value = value.strip().replace("$", "").replace(",", "")
+    if not value:
+        return 0.0
+    if value.startswith("(") and value.endswith(")"):
+        return -float(value[1:-1])
+    return float(value)
@@ -1,16 +1,37 @@
-from fastapi import FastAPI, Depends, HTTPException, Query
+from fastapi import FastAPI, Depends, HTTPException, Query, UploadFile, File, Form, BackgroundTasks
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.exception_handlers import request_validation_exception_handler
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import FileResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime
-from pydantic import BaseModel
-
-from .database import engine, get_db
-from . import models, schemas, crud
+import asyncio
+import json
+import os
+import tempfile
+from pydantic import BaseModel, Field, ValidationError
+
+from .database import async_engine, engine, get_async_db
+from . import models, schemas, crud, async_crud, rollups, migrations, importer, export
+from .category_registry import registry as category_registry
+from . import ai_parser
 from .ai_parser import parse_transaction
+from .parse_stats import stats as parse_stats
+from .parse_cache import cache as parse_cache
+from .analytics_cache import cache as analytics_cache
+from .categorizer import categorizer
+
+# Change log retention and how often it is compacted
+CHANGE_LOG_RETENTION_DAYS = int(os.getenv("CHANGE_LOG_RETENTION_DAYS", "30"))
+CHANGE_LOG_COMPACT_INTERVAL = int(os.getenv("CHANGE_LOG_COMPACT_INTERVAL", "3600"))  # seconds
 
-# Create database tables
+# Create database tables and bring existing ones up to date
 models.Base.metadata.create_all(bind=engine)
+migrations.migrate(engine)
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -29,18 +50,69 @@ app.add_middleware(
 )
 
 
+# ============== Validation Errors ==============
+
+@app.exception_handler(RequestValidationError)
+async def validation_exception_handler(request, exc: RequestValidationError):
+    """Return 422 as usual, leaving out inputs that can't be sent back as JSON."""
+    # The JSON body parser accepts Infinity and NaN, which strict JSON can't echo
+    return await request_validation_exception_handler(
+        request, RequestValidationError([_json_safe_error(e) for e in exc.errors()]),
+    )
+
+
+def _json_safe_error(error: dict) -> dict:
+    try:
+        json.dumps(jsonable_encoder(error.get("input")), allow_nan=False)
+    except ValueError:
+        return {**error, "input": None}
+    return error
+
+
 # ============== Startup Event ==============
 
 @app.on_event("startup")
 def startup_event():
-    """Initialize default categories on startup."""
+    """Initialize default categories, the category registry, analytics rollups and the categorizer on startup."""
     db = Session(bind=engine)
     try:
         crud.create_default_categories(db)
+        category_registry.load(db)
+        rollups.ensure_built(db)
+        categorizer.load(db)
     finally:
         db.close()
 
 
+def compact_change_log():
+    """Compact the transaction change log and apply retention."""
+    db = Session(bind=engine)
+    try:
+        crud.compact_changes(db, retention_days=CHANGE_LOG_RETENTION_DAYS)
+    finally:
+        db.close()
+
+
+async def compact_change_log_periodically():
+    while True:
+        await run_in_threadpool(compact_change_log)
+        await asyncio.sleep(CHANGE_LOG_COMPACT_INTERVAL)
+
+
+@app.on_event("startup")
+async def start_background_tasks():
+    """Start periodic change log compaction."""
+    app.state.compaction_task = asyncio.create_task(compact_change_log_periodically())
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background tasks and close the pooled OpenAI HTTP client and async engine."""
+    app.state.compaction_task.cancel()
+    await ai_parser.client.close()
+    await async_engine.dispose()
+
+
 # ============== Root Endpoint ==============
 
 @app.get("/")
@@ -63,8 +135,17 @@ class ParseResponse(BaseModel):
     data: Optional[dict] = None
     error: Optional[str] = None
 
+# Most lines accepted by one /api/parse/batch request
+PARSE_BATCH_MAX_LINES = 500
+
+class ParseBatchRequest(BaseModel):
+    lines: List[str] = Field(..., min_length=1, max_length=PARSE_BATCH_MAX_LINES)
+
+class ParseBatchResponse(BaseModel):
+    results: List[ParseResponse]
+
 @app.post("/api/parse", response_model=ParseResponse)
-def parse_transaction_text(request: ParseRequest):
+async def parse_transaction_text(request: ParseRequest):
     """
     Parse natural language into structured transaction data using AI.
     
@@ -73,34 +154,62 @@ def parse_transaction_text(request: ParseRequest):
     - "Uber ride 15"
     - "Paycheck $2500"
     """
-    result = parse_transaction(request.text)
+    result = await parse_transaction(request.text)
     return result
 
 
+@app.post("/api/parse/batch", response_model=ParseBatchResponse)
+async def parse_transaction_batch(request: ParseBatchRequest):
+    """
+    Parse many lines (e.g. a pasted bank statement) in one request.
+    
+    Results are returned in input order; a line that fails to parse gets its
+    own `success: false` entry without affecting the others.
+    """
+    results = await ai_parser.parse_batch(request.lines)
+    return {"results": results}
+
+
+@app.get("/api/parse/stats")
+def get_parse_stats():
+    """
+    Get hit rate and latency percentiles per parse path, OpenAI token usage
+    per call, plus parse cache, categorizer, coalescing and upstream counters.
+    """
+    return {
+        **parse_stats.snapshot(),
+        "tokens": parse_stats.usage(),
+        "cache": parse_cache.stats(),
+        "neighbours": categorizer.stats(),
+        "coalescing": ai_parser.in_flight.stats(),
+        "upstream": ai_parser.guard.stats(),
+    }
+
+
 # ============== Category Endpoints ==============
 
 @app.get("/api/categories", response_model=List[schemas.Category])
-def get_categories(db: Session = Depends(get_db)):
+async def get_categories(db: AsyncSession = Depends(get_async_db)):
     """Get all available categories."""
-    return crud.get_categories(db)
+    return await async_crud.get_categories(db)
 
 
 @app.post("/api/categories", response_model=schemas.Category, status_code=201)
-def create_category(category: schemas.CategoryCreate, db: Session = Depends(get_db)):
+async def create_category(category: schemas.CategoryCreate, db: AsyncSession = Depends(get_async_db)):
     """Create a new category."""
-    return crud.create_category(db, category)
+    return await async_crud.create_category(db, category)
 
 
 # ============== Transaction Endpoints ==============
 
 @app.get("/api/transactions", response_model=List[schemas.Transaction])
-def get_transactions(
+async def get_transactions(
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=500),
     category_id: Optional[int] = None,
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Get all transactions with optional filtering.
@@ -111,7 +220,7 @@ def get_transactions(
     - **start_date**: Filter transactions on or after this date
     - **end_date**: Filter transactions on or before this date
     """
-    return crud.get_transactions(
+    return await async_crud.get_transactions(
         db,
         skip=skip,
         limit=limit,
@@ -121,65 +230,321 @@ def get_transactions(
     )
 
 
+@app.get("/api/transactions/page", response_model=schemas.TransactionPage)
+async def get_transactions_page(
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None,
+    category_id: Optional[int] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Get transactions newest first using cursor pagination.
+    
+    - **limit**: Maximum number of records to return
+    - **cursor**: `next_cursor` or `prev_cursor` from a previous page; omit for the first page
+    - **category_id**, **start_date**, **end_date**: Same filters as `/api/transactions`
+    """
+    try:
+        items, next_cursor, prev_cursor = await async_crud.get_transactions_page(
+            db,
+            limit=limit,
+            cursor=cursor,
+            category_id=category_id,
+            start_date=start_date,
+            end_date=end_date,
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return {"items": items, "next_cursor": next_cursor, "prev_cursor": prev_cursor}
+
+
+@app.get("/api/transactions/export")
+async def export_transactions(
+    format: str = Query("ndjson", pattern="^(ndjson|csv|arrow|parquet)$"),
+    partition: Optional[str] = Query(None, pattern="^month$"),
+    category_id: Optional[int] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Export the full ledger (newest first).
+    
+    - **format**: `ndjson` or `csv` are streamed and accept the same filters as
+      `/api/transactions`; `arrow` (IPC file) or `parquet` export the whole
+      ledger and are cached until the next change; they carry amounts as exact
+      integer `amount_cents`
+    - **partition**: `month` for a zip with one Arrow/Parquet file per month
+    """
+    filters = {"category_id": category_id, "start_date": start_date, "end_date": end_date}
+    if format in ("arrow", "parquet"):
+        if any(value is not None for value in filters.values()):
+            raise HTTPException(status_code=400, detail="Columnar exports cover the full ledger and take no filters")
+        try:
+            # Writing a new file can take a while; keep it off the event loop
+            path = await run_in_threadpool(
+                export.columnar_file,
+                format,
+                by_month=partition == "month",
+                change_token=await async_crud.get_change_token(db),
+                categories_version=category_registry.version or 0,
+            )
+        except RuntimeError as e:
+            raise HTTPException(status_code=501, detail=str(e))
+        extension = "zip" if partition == "month" else format
+        media_type = {
+            "zip": "application/zip",
+            "arrow": "application/vnd.apache.arrow.file",
+            "parquet": "application/vnd.apache.parquet",
+        }[extension]
+        return FileResponse(path, media_type=media_type, filename=f"transactions.{extension}")
+    if partition:
+        raise HTTPException(status_code=400, detail="partition is only supported for arrow and parquet exports")
+    
+    if format == "csv":
+        return StreamingResponse(
+            export.csv_text(**filters),
+            media_type="text/csv",
+            headers={"Content-Disposition": 'attachment; filename="transactions.csv"'},
+        )
+    return StreamingResponse(
+        export.ndjson(**filters),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="transactions.ndjson"'},
+    )
+
+
 @app.get("/api/transactions/{transaction_id}", response_model=schemas.Transaction)
-def get_transaction(transaction_id: int, db: Session = Depends(get_db)):
+async def get_transaction(transaction_id: int, db: AsyncSession = Depends(get_async_db)):
     """Get a specific transaction by ID."""
-    transaction = crud.get_transaction(db, transaction_id)
+    transaction = await async_crud.get_transaction(db, transaction_id)
     if not transaction:
         raise HTTPException(status_code=404, detail="Transaction not found")
     return transaction
 
 
 @app.post("/api/transactions", response_model=schemas.Transaction, status_code=201)
-def create_transaction(transaction: schemas.TransactionCreate, db: Session = Depends(get_db)):
+async def create_transaction(transaction: schemas.TransactionCreate, db: AsyncSession = Depends(get_async_db)):
     """Create a new transaction."""
     # Verify category exists
-    category = crud.get_category(db, transaction.category_id)
+    category = await async_crud.get_category(db, transaction.category_id)
     if not category:
         raise HTTPException(status_code=400, detail="Invalid category_id")
-    return crud.create_transaction(db, transaction)
+    return await async_crud.create_transaction(db, transaction)
+
+
+def _validate_bulk_rows(rows: List[dict], categories: dict):
+    """Split bulk rows into valid transactions (with their indexes) and per-row errors."""
+    valid, valid_indexes, errors = [], [], []
+    for index, row in enumerate(rows):
+        try:
+            transaction = schemas.TransactionCreate.model_validate(row)
+        except ValidationError as e:
+            errors.append({"index": index, "error": "; ".join(
+                f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors()
+            )})
+            continue
+        if transaction.category_id not in categories:
+            errors.append({"index": index, "error": "Invalid category_id"})
+            continue
+        valid.append(transaction)
+        valid_indexes.append(index)
+    return valid, valid_indexes, errors
+
+
+@app.post("/api/transactions/bulk", response_model=schemas.TransactionBulkResult, status_code=201)
+async def bulk_create_transactions(request: schemas.TransactionBulkCreate, db: AsyncSession = Depends(get_async_db)):
+    """
+    Create many transactions with a single commit.
+    
+    - **mode**: `atomic` rejects the whole request if any row is invalid;
+      `best_effort` inserts the valid rows and reports the rest in `errors`
+    """
+    categories = await async_crud.get_categories_by_id(db)
+    # Validating up to 100k rows would stall every other request on the loop
+    valid, valid_indexes, errors = await run_in_threadpool(_validate_bulk_rows, request.transactions, categories)
+    
+    if errors and request.mode == "atomic":
+        raise HTTPException(status_code=400, detail=errors)
+    
+    ids: List[Optional[int]] = [None] * len(request.transactions)
+    for index, transaction_id in zip(valid_indexes, await async_crud.bulk_create_transactions(db, valid)):
+        ids[index] = transaction_id
+    return {"created": len(valid), "ids": ids, "errors": errors}
 
 
 @app.put("/api/transactions/{transaction_id}", response_model=schemas.Transaction)
-def update_transaction(
+async def update_transaction(
     transaction_id: int,
     transaction: schemas.TransactionCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update an existing transaction."""
     # Verify transaction exists
-    existing = crud.get_transaction(db, transaction_id)
+    existing = await async_crud.get_transaction(db, transaction_id)
     if not existing:
         raise HTTPException(status_code=404, detail="Transaction not found")
     
     # Verify category exists
-    category = crud.get_category(db, transaction.category_id)
+    category = await async_crud.get_category(db, transaction.category_id)
     if not category:
         raise HTTPException(status_code=400, detail="Invalid category_id")
     
-    return crud.update_transaction(db, transaction_id, transaction)
+    updated = await async_crud.update_transaction(db, transaction_id, transaction)
+    if not updated:
+        # Deleted by a concurrent request
+        raise HTTPException(status_code=404, detail="Transaction not found")
+    return updated
 
 
 @app.delete("/api/transactions/{transaction_id}", status_code=204)
-def delete_transaction(transaction_id: int, db: Session = Depends(get_db)):
+async def delete_transaction(transaction_id: int, db: AsyncSession = Depends(get_async_db)):
     """Delete a transaction by ID."""
-    success = crud.delete_transaction(db, transaction_id)
+    success = await async_crud.delete_transaction(db, transaction_id)
     if not success:
         raise HTTPException(status_code=404, detail="Transaction not found")
     return None
 
 
+# ============== Import Endpoints ==============
+
+@app.post("/api/import", response_model=schemas.ImportJob, status_code=202)
+async def import_statement(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    format: Optional[str] = Form(None, pattern="^(csv|ofx)$"),
+    profile: Optional[str] = Form(None),
+):
+    """
+    Import a CSV or OFX bank statement in the background.
+    
+    - **file**: The statement file
+    - **format**: `csv` or `ofx` (guessed from the file name if omitted)
+    - **profile**: JSON column mapping for CSV files (see `ImportProfile`)
+    
+    Returns a job whose progress can be polled at `/api/import/{job_id}`.
+    """
+    filename = file.filename or "upload"
+    file_format = format or ("ofx" if filename.lower().endswith((".ofx", ".qfx")) else "csv")
+    try:
+        import_profile = schemas.ImportProfile.model_validate_json(profile) if profile else schemas.ImportProfile()
+    except ValidationError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid profile: {e}")
+    
+    # Spool the upload to disk in chunks; the worker streams it from there
+    fd, path = tempfile.mkstemp(prefix="nonna-import-", suffix="." + file_format)
+    with os.fdopen(fd, "wb") as out:
+        while chunk := await file.read(1024 * 1024):
+            out.write(chunk)
+    
+    job = importer.create_job(filename, file_format)
+    background_tasks.add_task(importer.run_import, job, path, import_profile)
+    return job.to_dict()
+
+
+@app.get("/api/import/{job_id}", response_model=schemas.ImportJob)
+def get_import_job(job_id: str):
+    """Get the progress of an import job."""
+    job = importer.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return job.to_dict()
+
+
 # ============== Analytics Endpoints ==============
 
 @app.get("/api/analytics/summary", response_model=schemas.AnalyticsSummary)
-def get_analytics_summary(
+async def get_analytics_summary(
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Get spending analytics summary.
     
     Returns total income, total expenses, net balance, and breakdown by category.
+    Ranges made of whole days (or open-ended) are cached until the next write.
     """
-    return crud.get_analytics_summary(db, start_date=start_date, end_date=end_date)
+    return await async_crud.get_analytics_summary(db, start_date=start_date, end_date=end_date)
+
+
+@app.get("/api/analytics/cache")
+async def get_analytics_cache_stats():
+    """Get analytics cache size, hit ratio and invalidation counters."""
+    return analytics_cache.stats()
+
+
+# ============== Dashboard Endpoint ==============
+
+@app.get("/api/dashboard", response_model=schemas.Dashboard)
+async def get_dashboard(
+    since: Optional[int] = Query(None, ge=0),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Get transactions, categories and the analytics summary in one request.
+    
+    - **since**: `change_token` from a previous response; only transactions
+      changed after it (plus `deleted_ids`) are returned instead of the full list
+    
+    All parts are read from one database snapshot, so the summary always
+    matches the transactions and the change token.
+    """
+    await async_crud.begin_snapshot(db)
+    change_token = await async_crud.get_change_token(db)
+    
+    if since is not None and await async_crud.get_change_horizon(db) <= since <= change_token:
+        transactions, deleted_ids = await async_crud.get_changed_transactions(db, since=since, until=change_token)
+        full = False
+    else:
+        transactions, deleted_ids = await async_crud.get_transactions(db), []
+        full = True
+    
+    return {
+        "change_token": change_token,
+        "full": full,
+        "transactions": transactions,
+        "deleted_ids": deleted_ids,
+        "categories": await async_crud.get_categories(db),
+        "summary": await async_crud.get_analytics_summary(db, snapshot=True),
+    }
+
+
+# ============== Change Feed Endpoint ==============
+
+@app.get("/api/changes", response_model=schemas.ChangeFeed)
+async def get_changes(
+    after: int = Query(0, ge=0),
+    limit: int = Query(500, ge=1, le=5000),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Get transaction changes in order, for incremental sync.
+    
+    - **after**: Return changes with a higher seq (use `last_seq` from the previous call)
+    - **limit**: Maximum number of changes to return
+    
+    Deletes are returned as tombstones (`op: "delete"`, no transaction). The log
+    is compacted to the latest change per transaction, and changes older than
+    the retention period are dropped; resuming from before that point returns
+    410 with the current `change_token` and `horizon`. The client must then
+    resync from `/api/dashboard` and continue from its `change_token`.
+    """
+    # One snapshot, so compaction can't drop changes between the horizon
+    # check and the read
+    await async_crud.begin_snapshot(db)
+    horizon = await async_crud.get_change_horizon(db)
+    if after < horizon:
+        raise HTTPException(status_code=410, detail={
+            "message": "Changes after this seq are no longer retained; resync from /api/dashboard",
+            "change_token": await async_crud.get_change_token(db),
+            "horizon": horizon,
+        })
+    changes, has_more = await async_crud.get_changes(db, after=after, limit=limit)
+    return {
+        "changes": changes,
+        "last_seq": changes[-1]["seq"] if changes else after,
+        "has_more": has_more,
+    }
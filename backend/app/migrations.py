@@ -0,0 +1,115 @@
+# Versioned schema migrations, applied on startup
+from sqlalchemy import exists, func, inspect, select, text
+from sqlalchemy.engine import Connection, Engine
+
+from . import models
+from .crud import CHANGE_HORIZON_COUNTER, CHANGES_COUNTER
+from .schemas import to_cents
+
+
+def _create_transaction_indexes(conn: Connection) -> None:
+    """Create the transaction indexes on databases that predate them."""
+    # Indexes on columns a later migration adds are created by that migration
+    columns = {c["name"] for c in inspect(conn).get_columns("transactions")}
+    for index in models.Transaction.__table__.indexes:
+        if all(column.name in columns for column in index.columns):
+            index.create(conn, checkfirst=True)
+
+
+def _store_amounts_as_cents(conn: Connection) -> None:
+    """Replace the Float amount with integer cents and rebuild the rollups in cents."""
+    columns = {c["name"] for c in inspect(conn).get_columns("transactions")}
+    if "amount" not in columns:
+        # Created with amount_cents already
+        return
+
+    conn.execute(text("DROP INDEX IF EXISTS ix_transactions_type_date_category_amount"))
+    if "amount_cents" not in columns:
+        conn.execute(text("ALTER TABLE transactions ADD COLUMN amount_cents BIGINT NOT NULL DEFAULT 0"))
+    # Rounded in Python like new amounts; amounts under half a cent become
+    # one cent, the smallest amount the API accepts and returns
+    rows = conn.execute(text("SELECT id, amount FROM transactions")).all()
+    if rows:
+        conn.execute(
+            text("UPDATE transactions SET amount_cents = :cents WHERE id = :id"),
+            [{"id": id, "cents": max(1, to_cents(amount))} for id, amount in rows],
+        )
+    conn.execute(text("ALTER TABLE transactions DROP COLUMN amount"))
+    _create_transaction_indexes(conn)
+
+    # Rollups hold derived Float totals; recreate them empty and let startup rebuild them
+    for model in (models.DailyRollup, models.MonthlyRollup):
+        model.__table__.drop(conn, checkfirst=True)
+        model.__table__.create(conn)
+
+
+def _drop_aggregation_index(conn: Connection) -> None:
+    """Drop the (type, date, category, amount) index; no query filters on transaction_type first."""
+    conn.execute(text("DROP INDEX IF EXISTS ix_transactions_type_date_category_amount"))
+
+
+def _seed_change_counter(conn: Connection) -> None:
+    """
+    Start the change counter at the latest logged seq. If transactions
+    predate the change log, move the horizon to 1 so clients reading the
+    feed from 0 resync instead of missing them.
+    """
+    changes = models.TransactionChange.__table__
+    transactions = models.Transaction.__table__
+    latest = conn.scalar(select(func.max(changes.c.seq))) or 0
+    horizon = _read_counter(conn, CHANGE_HORIZON_COUNTER)
+    unlogged = conn.scalar(
+        select(transactions.c.id)
+        .where(~exists().where(changes.c.transaction_id == transactions.c.id))
+        .limit(1)
+    )
+    if unlogged is not None and horizon == 0:
+        horizon = 1
+        _set_counter(conn, CHANGE_HORIZON_COUNTER, horizon)
+    _set_counter(conn, CHANGES_COUNTER, max(latest, horizon))
+
+
+def _read_counter(conn: Connection, name: str) -> int:
+    counters = models.VersionCounter.__table__
+    return conn.scalar(select(counters.c.value).where(counters.c.name == name)) or 0
+
+
+def _set_counter(conn: Connection, name: str, value: int) -> None:
+    counters = models.VersionCounter.__table__
+    result = conn.execute(counters.update().where(counters.c.name == name).values(value=value))
+    if result.rowcount == 0:
+        conn.execute(counters.insert(), {"name": name, "value": value})
+
+
+def _clamp_zero_amounts(conn: Connection) -> None:
+    """Raise amounts an earlier conversion rounded to 0 cents to 1 cent and rebuild the rollups."""
+    clamped = conn.execute(text("UPDATE transactions SET amount_cents = 1 WHERE amount_cents < 1")).rowcount
+    if clamped:
+        # Emptied rollups are rebuilt on startup
+        conn.execute(models.DailyRollup.__table__.delete())
+        conn.execute(models.MonthlyRollup.__table__.delete())
+
+
+# (version, description, step) - append only, never renumber
+MIGRATIONS = [
+    (1, "Add transaction date, category and aggregation indexes", _create_transaction_indexes),
+    (2, "Store transaction amounts and rollup totals as integer cents", _store_amounts_as_cents),
+    (3, "Drop the unused transaction aggregation index", _drop_aggregation_index),
+    (4, "Assign change log seqs from a counter", _seed_change_counter),
+    (5, "Clamp transaction amounts rounded to zero cents", _clamp_zero_amounts),
+]
+
+
+def migrate(engine: Engine) -> None:
+    """Apply every migration newer than the version recorded in the database."""
+    models.SchemaMigration.__table__.create(engine, checkfirst=True)
+    with engine.begin() as conn:
+        applied = set(conn.scalars(select(models.SchemaMigration.version)))
+        for version, description, step in MIGRATIONS:
+            if version in applied:
+                continue
+            step(conn)
+            conn.execute(
+                models.SchemaMigration.__table__.insert(),
+                {"version": version, "description": description},
+            )
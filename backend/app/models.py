@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey
+from sqlalchemy import BigInteger, Column, Integer, String, Date, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
@@ -21,7 +21,7 @@ class Transaction(Base):
     __tablename__ = "transactions"
 
     id = Column(Integer, primary_key=True, index=True)
-    amount = Column(Float, nullable=False)
+    amount_cents = Column(BigInteger, nullable=False)  # Integer minor units; 12.34 is 1234
     description = Column(String(255), nullable=False)
     transaction_type = Column(String(10), default="expense")  # "expense" or "income"
     date = Column(DateTime, nullable=False)
@@ -29,3 +29,70 @@ class Transaction(Base):
     
     category_id = Column(Integer, ForeignKey("categories.id"), nullable=False)
     category = relationship("Category", back_populates="transactions")
+
+    __table_args__ = (
+        # Scanned backwards for "date desc, id desc" listings and keyset pagination
+        Index("ix_transactions_date_id", "date", "id"),
+        Index("ix_transactions_category_date", "category_id", "date"),
+    )
+
+
+class TransactionChange(Base):
+    """Append-only log of transaction writes, ordered by seq."""
+    __tablename__ = "transaction_changes"
+
+    # Assigned from the "changes" counter, so seqs are visible in commit order
+    seq = Column(Integer, primary_key=True, autoincrement=False)
+    transaction_id = Column(Integer, nullable=False, index=True)
+    op = Column(String(10), nullable=False)  # "create", "update" or "delete"
+    changed_at = Column(DateTime, server_default=func.now())
+
+
+class SchemaMigration(Base):
+    """Applied schema migrations, one row per version."""
+    __tablename__ = "schema_migrations"
+
+    version = Column(Integer, primary_key=True)
+    description = Column(String(255), nullable=False)
+    applied_at = Column(DateTime, server_default=func.now())
+
+
+class VersionCounter(Base):
+    """Monotonic counters that let workers detect changes made by other workers."""
+    __tablename__ = "version_counters"
+
+    name = Column(String(50), primary_key=True)
+    value = Column(Integer, nullable=False, default=0)
+
+
+class DailyRollup(Base):
+    """Per-day totals of transactions by category and type."""
+    __tablename__ = "daily_rollups"
+
+    day = Column(Date, primary_key=True)
+    category_id = Column(Integer, ForeignKey("categories.id"), primary_key=True)
+    transaction_type = Column(String(10), primary_key=True)
+    total_cents = Column(BigInteger, nullable=False, default=0)
+    count = Column(Integer, nullable=False, default=0)
+
+
+class MonthlyRollup(Base):
+    """Per-month totals of transactions by category and type."""
+    __tablename__ = "monthly_rollups"
+
+    month = Column(Date, primary_key=True)  # First day of the month
+    category_id = Column(Integer, ForeignKey("categories.id"), primary_key=True)
+    transaction_type = Column(String(10), primary_key=True)
+    total_cents = Column(BigInteger, nullable=False, default=0)
+    count = Column(Integer, nullable=False, default=0)
+
+
+class ParseCacheEntry(Base):
+    """Persisted parse result for a normalized input (amount masked out)."""
+    __tablename__ = "parse_cache"
+
+    key = Column(String(64), primary_key=True)  # sha256 of the normalized input
+    description = Column(String(255), nullable=False)
+    category = Column(String(50), nullable=False)
+    transaction_type = Column(String(10), nullable=False)
+    created_at = Column(DateTime, nullable=False, index=True)
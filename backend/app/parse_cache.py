@@ -0,0 +1,160 @@
+# Parse result cache keyed on normalized input, in memory and in SQLite
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Optional
+
+from . import models, rule_parser
+from .database import SessionLocal
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize(text: str) -> str:
+    """Case-fold, mask amounts and collapse whitespace: "Coffee $4.50" -> "coffee #"."""
+    text = rule_parser.mask_amounts(text.casefold())
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+class ParseCache:
+    """
+    Bounded LRU of category decisions in front of the LLM, backed by the
+    parse_cache table so entries survive restarts.
+
+    Entries store everything but the amount, which is re-extracted from each
+    input, so "coffee 4.50" and "coffee 5" share one decision.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl: timedelta = timedelta(days=30), session_factory=SessionLocal):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._session_factory = session_factory
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._writes_since_prune = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, user_input: str) -> Optional[dict]:
+        """Get a cached parse result for the input, or None on a miss."""
+        amount = rule_parser.extract_amount(user_input)
+        if amount is None:
+            # Without a local amount a cached category decision can't be used
+            with self._lock:
+                self.misses += 1
+            return None
+
+        key = _key(user_input)
+        now = datetime.utcnow()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[3] > self.ttl:
+                del self._entries[key]
+                self.evictions += 1
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+
+        if entry is None:
+            entry = self._load(key, now)
+
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+
+        description, category, transaction_type, _ = entry
+        return {
+            "amount": amount,
+            "description": description,
+            "category": category,
+            "transaction_type": transaction_type,
+        }
+
+    def put(self, user_input: str, data: dict) -> None:
+        """Store a parse result (the amount is not cached)."""
+        key = _key(user_input)
+        entry = (data["description"], data["category"], data["transaction_type"], datetime.utcnow())
+        self._remember(key, entry)
+
+        db = self._session_factory()
+        try:
+            db.merge(models.ParseCacheEntry(
+                key=key,
+                description=entry[0],
+                category=entry[1],
+                transaction_type=entry[2],
+                created_at=entry[3],
+            ))
+            db.commit()
+            self._writes_since_prune += 1
+            if self._writes_since_prune >= 100:
+                self._writes_since_prune = 0
+                self._prune(db)
+        finally:
+            db.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "size": len(self._entries),
+            }
+
+    def _remember(self, key: str, entry: tuple) -> None:
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _load(self, key: str, now: datetime) -> Optional[tuple]:
+        db = self._session_factory()
+        try:
+            row = db.get(models.ParseCacheEntry, key)
+            if row is None:
+                return None
+            if now - row.created_at > self.ttl:
+                db.delete(row)
+                db.commit()
+                with self._lock:
+                    self.evictions += 1
+                return None
+            entry = (row.description, row.category, row.transaction_type, row.created_at)
+        finally:
+            db.close()
+        self._remember(key, entry)
+        return entry
+
+    def _prune(self, db) -> None:
+        """Drop expired rows and everything beyond max_entries, oldest first."""
+        expired = db.query(models.ParseCacheEntry).filter(
+            models.ParseCacheEntry.created_at < datetime.utcnow() - self.ttl
+        ).delete(synchronize_session=False)
+        cutoff = db.query(models.ParseCacheEntry.created_at).order_by(
+            models.ParseCacheEntry.created_at.desc()
+        ).offset(self.max_entries).limit(1).scalar()
+        overflow = 0
+        if cutoff is not None:
+            overflow = db.query(models.ParseCacheEntry).filter(
+                models.ParseCacheEntry.created_at <= cutoff
+            ).delete(synchronize_session=False)
+        db.commit()
+        with self._lock:
+            self.evictions += expired + overflow
+
+
+def _key(user_input: str) -> str:
+    return hashlib.sha256(normalize(user_input).encode()).hexdigest()
+
+
+cache = ParseCache()
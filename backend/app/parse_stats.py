@@ -0,0 +1,81 @@
+# Hit counts and latency percentiles for each parse path
+import threading
+from collections import defaultdict, deque
+from typing import Dict
+
+
+class ParseStats:
+    """
+    Thread-safe per-path call counters with a bounded latency window, plus
+    token usage of OpenAI calls (totals per path and the most recent calls).
+    """
+
+    def __init__(self, window: int = 1000, recent_calls: int = 50):
+        self._lock = threading.Lock()
+        self._window = window
+        self._counts: Dict[str, int] = defaultdict(int)
+        self._latencies: Dict[str, deque] = defaultdict(lambda: deque(maxlen=self._window))
+        self._usage: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self._recent_calls: deque = deque(maxlen=recent_calls)
+
+    def record(self, path: str, seconds: float) -> None:
+        with self._lock:
+            self._counts[path] += 1
+            self._latencies[path].append(seconds)
+
+    def record_usage(self, path: str, usage, seconds: float, lines: int = 1) -> None:
+        """Record the token usage of one OpenAI call that parsed `lines` inputs."""
+        prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+        completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+        with self._lock:
+            totals = self._usage[path]
+            totals["calls"] += 1
+            totals["lines"] += lines
+            totals["prompt_tokens"] += prompt_tokens
+            totals["completion_tokens"] += completion_tokens
+            self._recent_calls.append({
+                "path": path,
+                "lines": lines,
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "latency_ms": round(seconds * 1000, 3),
+            })
+
+    def usage(self) -> dict:
+        """Get token totals and per-line averages for each OpenAI path, plus the most recent calls."""
+        with self._lock:
+            paths = {}
+            for path, totals in self._usage.items():
+                lines = totals["lines"]
+                paths[path] = {
+                    **totals,
+                    "prompt_tokens_per_line": round(totals["prompt_tokens"] / lines, 1) if lines else 0.0,
+                    "completion_tokens_per_line": round(totals["completion_tokens"] / lines, 1) if lines else 0.0,
+                }
+            return {"paths": paths, "recent_calls": list(self._recent_calls)}
+
+    def snapshot(self) -> dict:
+        """Get hit rate and p50/p95/p99 latency (ms) for every path seen so far."""
+        with self._lock:
+            total = sum(self._counts.values())
+            paths = {}
+            for path, count in self._counts.items():
+                samples = sorted(self._latencies[path])
+                paths[path] = {
+                    "count": count,
+                    "hit_rate": round(count / total, 4) if total else 0.0,
+                    "p50_ms": _percentile_ms(samples, 50),
+                    "p95_ms": _percentile_ms(samples, 95),
+                    "p99_ms": _percentile_ms(samples, 99),
+                }
+            return {"total": total, "paths": paths}
+
+
+def _percentile_ms(samples, percentile: int) -> float:
+    if not samples:
+        return 0.0
+    index = min(len(samples) - 1, int(round(percentile / 100 * (len(samples) - 1))))
+    return round(samples[index] * 1000, 3)
+
+
+stats = ParseStats()
@@ -0,0 +1,224 @@
+# Deadlines, retries and a circuit breaker around upstream (OpenAI) calls
+import asyncio
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Awaitable, Callable, Optional, Tuple, Type, TypeVar
+
+T = TypeVar("T")
+
+# Seconds one parse may spend on the upstream call, retries included
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "10"))
+# Retries after the first attempt, if the retry budget and deadline allow
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "2"))
+# Retries earned per first attempt, e.g. 0.1 allows retries on ~10% of calls
+OPENAI_RETRY_RATIO = float(os.getenv("OPENAI_RETRY_RATIO", "0.1"))
+# Share of recent attempts that must fail for the breaker to open
+OPENAI_BREAKER_ERROR_RATE = float(os.getenv("OPENAI_BREAKER_ERROR_RATE", "0.5"))
+# Seconds the breaker stays open before letting a probe call through
+OPENAI_BREAKER_COOLDOWN = float(os.getenv("OPENAI_BREAKER_COOLDOWN", "15"))
+
+
+class Unavailable(Exception):
+    """The upstream can't be used right now: the breaker is open, or the call failed or timed out."""
+
+
+class RetryBudget:
+    """
+    Token bucket shared by all calls: each first attempt deposits `ratio`
+    tokens and each retry spends one, so retries stay a bounded fraction of
+    traffic and can't multiply load on an upstream that is already failing.
+    """
+
+    def __init__(self, ratio: float = OPENAI_RETRY_RATIO, max_tokens: float = 10.0):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self._tokens = max_tokens
+        self._lock = threading.Lock()
+
+    def deposit(self) -> None:
+        with self._lock:
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        """Spend one token for a retry, or return False if the budget is used up."""
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+    @property
+    def tokens(self) -> float:
+        return self._tokens
+
+
+class CircuitBreaker:
+    """
+    Error-rate breaker over the last `window` attempts.
+
+    Closed: calls go through. Once at least `min_calls` of the window are
+    recorded and `error_rate` of them failed, it opens and rejects calls for
+    `cooldown` seconds. Then it is half open: one probe call goes through,
+    closing the breaker on success and reopening it on failure.
+    """
+
+    def __init__(
+        self,
+        error_rate: float = OPENAI_BREAKER_ERROR_RATE,
+        cooldown: float = OPENAI_BREAKER_COOLDOWN,
+        window: int = 20,
+        min_calls: int = 10,
+    ):
+        self.error_rate = error_rate
+        self.cooldown = cooldown
+        self.min_calls = min_calls
+        self._outcomes: deque = deque(maxlen=window)
+        self._opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+        self.trips = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state()
+
+    def allow(self) -> Optional[str]:
+        """
+        Claim a call to the upstream: "closed" for a normal call, "probe" for
+        the half-open probe, or None if the call must not be made.
+        """
+        with self._lock:
+            state = self._state()
+            if state == "closed":
+                return "closed"
+            if state == "half_open" and not self._probing:
+                self._probing = True
+                return "probe"
+            self.rejected += 1
+            return None
+
+    def record(self, ticket: str, ok: bool) -> None:
+        """Report the outcome of a call claimed with allow()."""
+        with self._lock:
+            if ticket == "probe":
+                self._probing = False
+                if ok:
+                    self._opened_at = None
+                    self._outcomes.clear()
+                else:
+                    self._opened_at = time.monotonic()
+                return
+            if self._opened_at is not None:
+                # Started before the breaker opened
+                return
+
+            self._outcomes.append(ok)
+            failures = self._outcomes.count(False)
+            if len(self._outcomes) >= self.min_calls and failures / len(self._outcomes) >= self.error_rate:
+                self._opened_at = time.monotonic()
+                self.trips += 1
+
+    def abandon(self, ticket: str) -> None:
+        """Give up a claimed call without an outcome (the caller was cancelled)."""
+        if ticket == "probe":
+            with self._lock:
+                self._probing = False
+
+    def _state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.cooldown:
+            return "half_open"
+        return "open"
+
+
+class Guard:
+    """Runs upstream calls under a deadline, with budgeted jittered retries behind a circuit breaker."""
+
+    def __init__(
+        self,
+        retryable: Tuple[Type[BaseException], ...] = (),
+        max_retries: int = OPENAI_MAX_RETRIES,
+        base_delay: float = 0.1,
+        max_delay: float = 2.0,
+    ):
+        self.retryable = retryable
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker = CircuitBreaker()
+        self.budget = RetryBudget()
+        self.calls = 0
+        self.retries = 0
+        self.retries_denied = 0
+        self.timeouts = 0
+        self.failures = 0
+
+    async def call(self, attempt: Callable[[], Awaitable[T]], timeout: float = OPENAI_TIMEOUT) -> T:
+        """
+        Run attempt() until it succeeds, retrying transient errors while the
+        deadline, retry budget and breaker allow it.
+
+        Raises Unavailable instead of waiting when the breaker is open, and
+        once the deadline passes or the retries run out. Errors that aren't
+        retryable (e.g. a 400) propagate as they are.
+        """
+        deadline = time.monotonic() + timeout
+        self.calls += 1
+        self.budget.deposit()
+        for retry in range(self.max_retries + 1):
+            ticket = self.breaker.allow()
+            if ticket is None:
+                raise Unavailable("AI parser is temporarily unavailable")
+            remaining = deadline - time.monotonic()
+            try:
+                result = await asyncio.wait_for(attempt(), remaining)
+            except asyncio.TimeoutError:
+                self.breaker.record(ticket, False)
+                self.timeouts += 1
+                raise Unavailable(f"AI parser timed out after {timeout:g}s")
+            except asyncio.CancelledError:
+                self.breaker.abandon(ticket)
+                raise
+            except self.retryable as e:
+                self.breaker.record(ticket, False)
+                error = e
+            except BaseException:
+                # The upstream answered; the request itself was bad
+                self.breaker.record(ticket, True)
+                raise
+            else:
+                self.breaker.record(ticket, True)
+                return result
+
+            if retry == self.max_retries:
+                break
+            delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** retry))
+            if time.monotonic() + delay >= deadline:
+                break
+            if not self.budget.withdraw():
+                self.retries_denied += 1
+                break
+            self.retries += 1
+            await asyncio.sleep(delay)
+
+        self.failures += 1
+        raise Unavailable(f"AI parser failed: {error}")
+
+    def stats(self) -> dict:
+        return {
+            "breaker": self.breaker.state,
+            "trips": self.breaker.trips,
+            "rejected": self.breaker.rejected,
+            "calls": self.calls,
+            "retries": self.retries,
+            "retries_denied": self.retries_denied,
+            "retry_tokens": round(self.budget.tokens, 2),
+            "timeouts": self.timeouts,
+            "failures": self.failures,
+        }
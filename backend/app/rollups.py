@@ -0,0 +1,295 @@
+# Materialized daily/monthly rollups of transaction totals
+import sys
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from . import models
+
+# (bucket day, category_id, transaction_type) -> [total cents, count]
+Deltas = Dict[Tuple[date, int, str], List]
+
+# Upserts are dialect-specific constructs in SQLAlchemy
+_DIALECT_INSERTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+
+# ============== Incremental Maintenance ==============
+
+def collect(transactions: Iterable[models.Transaction], sign: int, deltas: Optional[Deltas] = None) -> Deltas:
+    """Accumulate the rollup contribution of transactions (sign +1 to add, -1 to remove)."""
+    if deltas is None:
+        deltas = defaultdict(lambda: [0, 0])
+    for t in transactions:
+        bucket = deltas[(t.date.date(), t.category_id, t.transaction_type)]
+        bucket[0] += sign * t.amount_cents
+        bucket[1] += sign
+    return deltas
+
+
+def apply(db: Session, deltas: Deltas) -> None:
+    """Apply accumulated deltas to the daily and monthly rollups (caller commits)."""
+    monthly = defaultdict(lambda: [0, 0])
+    for (day, category_id, t_type), (total, count) in deltas.items():
+        bucket = monthly[(day.replace(day=1), category_id, t_type)]
+        bucket[0] += total
+        bucket[1] += count
+    _apply(db, models.DailyRollup, deltas)
+    _apply(db, models.MonthlyRollup, monthly)
+
+
+def _apply(db: Session, model, deltas: Deltas) -> None:
+    """
+    Add each (total, count) delta to its bucket row, dropping rows that become empty.
+
+    The additions happen in the database (INSERT ... ON CONFLICT DO UPDATE), so
+    concurrent writers to the same bucket can't overwrite each other's totals.
+    """
+    deltas = {key: delta for key, delta in deltas.items() if delta[0] != 0 or delta[1] != 0}
+    if not deltas:
+        return
+    column = _bucket_column(model)
+    table = model.__table__
+    insert = _DIALECT_INSERTS[db.get_bind().dialect.name](table)
+    db.execute(
+        insert.on_conflict_do_update(
+            index_elements=[c.name for c in table.primary_key.columns],
+            set_={
+                "total_cents": table.c.total_cents + insert.excluded.total_cents,
+                "count": table.c.count + insert.excluded.count,
+            },
+        ),
+        [
+            {column.key: bucket, "category_id": category_id, "transaction_type": t_type,
+             "total_cents": total, "count": count}
+            for (bucket, category_id, t_type), (total, count) in deltas.items()
+        ],
+    )
+    buckets = sorted({bucket for bucket, _, _ in deltas})
+    for i in range(0, len(buckets), 500):
+        db.execute(delete(model).where(column.in_(buckets[i:i + 500]), model.count <= 0))
+
+
+def _bucket_column(model):
+    return model.day if model is models.DailyRollup else model.month
+
+
+# ============== Range Queries ==============
+
+def summary_rows(
+    db: Session,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+) -> List[tuple]:
+    """
+    Get (type, category_id, total cents, count) rows for a date range.
+
+    Whole months are read from the monthly rollups, remaining whole days from
+    the daily rollups, and only the partial days at either edge from the raw
+    transactions table.
+    """
+    first_day, last_day = _full_day_span(start_date, end_date)
+    if first_day is not None and last_day is not None and first_day > last_day:
+        # No whole day inside the range
+        return _combine(_raw_rows(db, start_date, end_date))
+
+    parts = []
+    if start_date is not None and datetime.combine(first_day, time.min) > start_date:
+        parts.append(_raw_rows(db, start_date, datetime.combine(first_day, time.min), end_inclusive=False))
+    if end_date is not None and datetime.combine(last_day + timedelta(days=1), time.min) <= end_date:
+        parts.append(_raw_rows(db, datetime.combine(last_day + timedelta(days=1), time.min), end_date))
+
+    first_month, last_month = _full_month_span(first_day, last_day)
+    if first_month is None or last_month is None or first_month <= last_month:
+        parts.append(_rollup_rows(db, models.MonthlyRollup, first_month, last_month))
+        if first_month is not None and first_day < first_month:
+            parts.append(_rollup_rows(db, models.DailyRollup, first_day, first_month - timedelta(days=1)))
+        if last_month is not None:
+            after_last_month = _next_month(last_month)
+            if last_day is None or after_last_month <= last_day:
+                parts.append(_rollup_rows(db, models.DailyRollup, after_last_month, last_day))
+    else:
+        parts.append(_rollup_rows(db, models.DailyRollup, first_day, last_day))
+
+    return _combine(*parts)
+
+
+def _full_day_span(start_date: Optional[datetime], end_date: Optional[datetime]):
+    """First and last calendar days fully covered by the range (None = unbounded)."""
+    first_day = last_day = None
+    if start_date is not None:
+        first_day = start_date.date()
+        if start_date.time() != time.min:
+            first_day += timedelta(days=1)
+    if end_date is not None:
+        last_day = end_date.date()
+        if end_date.time() != time.max:
+            last_day -= timedelta(days=1)
+    return first_day, last_day
+
+
+def _full_month_span(first_day: Optional[date], last_day: Optional[date]):
+    """First days of the first and last months fully covered by [first_day, last_day]."""
+    first_month = last_month = None
+    if first_day is not None:
+        first_month = first_day if first_day.day == 1 else _next_month(first_day)
+    if last_day is not None:
+        last_month = last_day.replace(day=1)
+        if (last_day + timedelta(days=1)).month == last_day.month:
+            last_month = _previous_month(last_month)
+    return first_month, last_month
+
+
+def _next_month(day: date) -> date:
+    return (day.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+
+def _previous_month(day: date) -> date:
+    return (day.replace(day=1) - timedelta(days=1)).replace(day=1)
+
+
+def _raw_rows(db: Session, start_date, end_date, end_inclusive: bool = True) -> List[tuple]:
+    query = db.query(
+        models.Transaction.transaction_type,
+        models.Transaction.category_id,
+        func.sum(models.Transaction.amount_cents),
+        func.count(models.Transaction.id),
+    )
+
+    if start_date is not None:
+        query = query.filter(models.Transaction.date >= start_date)
+    if end_date is not None:
+        if end_inclusive:
+            query = query.filter(models.Transaction.date <= end_date)
+        else:
+            query = query.filter(models.Transaction.date < end_date)
+
+    return query.group_by(
+        models.Transaction.transaction_type,
+        models.Transaction.category_id,
+    ).all()
+
+
+def _rollup_rows(db: Session, model, first: Optional[date], last: Optional[date]) -> List[tuple]:
+    bucket = _bucket_column(model)
+    query = db.query(
+        model.transaction_type,
+        model.category_id,
+        func.sum(model.total_cents),
+        func.sum(model.count),
+    )
+
+    if first is not None:
+        query = query.filter(bucket >= first)
+    if last is not None:
+        query = query.filter(bucket <= last)
+
+    return query.group_by(
+        model.transaction_type,
+        model.category_id,
+    ).all()
+
+
+def _combine(*parts: List[tuple]) -> List[tuple]:
+    """Merge per-source rows into one (type, category_id, total cents, count) row per category."""
+    combined = defaultdict(lambda: [0, 0])
+    for rows in parts:
+        for t_type, category_id, total, count in rows:
+            bucket = combined[(t_type, category_id)]
+            # SUM over BIGINT comes back as Decimal on PostgreSQL
+            bucket[0] += int(total)
+            bucket[1] += int(count)
+    return [(t_type, category_id, total, count) for (t_type, category_id), (total, count) in combined.items()]
+
+
+# ============== Rebuild & Verify ==============
+
+def _scan(db: Session) -> Tuple[Deltas, Deltas]:
+    """Recompute daily and monthly buckets from the raw transactions table."""
+    daily = defaultdict(lambda: [0, 0])
+    monthly = defaultdict(lambda: [0, 0])
+    rows = db.query(
+        models.Transaction.date,
+        models.Transaction.category_id,
+        models.Transaction.transaction_type,
+        models.Transaction.amount_cents,
+    ).yield_per(5000)
+    for t_date, category_id, t_type, amount_cents in rows:
+        day = t_date.date()
+        for buckets, key in ((daily, day), (monthly, day.replace(day=1))):
+            bucket = buckets[(key, category_id, t_type)]
+            bucket[0] += amount_cents
+            bucket[1] += 1
+    return daily, monthly
+
+
+def rebuild(db: Session) -> None:
+    """Recompute all rollups from scratch."""
+    daily, monthly = _scan(db)
+    db.query(models.DailyRollup).delete()
+    db.query(models.MonthlyRollup).delete()
+    db.bulk_insert_mappings(models.DailyRollup, [
+        {"day": day, "category_id": c, "transaction_type": t, "total_cents": total, "count": count}
+        for (day, c, t), (total, count) in daily.items()
+    ])
+    db.bulk_insert_mappings(models.MonthlyRollup, [
+        {"month": month, "category_id": c, "transaction_type": t, "total_cents": total, "count": count}
+        for (month, c, t), (total, count) in monthly.items()
+    ])
+    db.commit()
+
+
+def verify(db: Session) -> List[str]:
+    """Compare rollups against the raw table, returning a description of each mismatch."""
+    expected = dict(zip(("daily", "monthly"), _scan(db)))
+    problems = []
+    for name, model in (("daily", models.DailyRollup), ("monthly", models.MonthlyRollup)):
+        bucket = _bucket_column(model)
+        actual = {
+            (b, c, t): (total, count)
+            for b, c, t, total, count in db.query(
+                bucket, model.category_id, model.transaction_type, model.total_cents, model.count
+            )
+        }
+        for key in sorted(set(actual) | set(expected[name]), key=str):
+            total, count = actual.get(key, (0, 0))
+            exp_total, exp_count = expected[name].get(key, (0, 0))
+            # Integer cents, so rollups must match exactly
+            if count != exp_count or total != exp_total:
+                problems.append(
+                    f"{name} {key}: rollup total_cents={total} count={count}, "
+                    f"raw total_cents={exp_total} count={exp_count}"
+                )
+    return problems
+
+
+def ensure_built(db: Session) -> None:
+    """Build rollups for a database that has transactions but no rollups yet."""
+    has_rollups = db.query(models.MonthlyRollup.month).first() is not None
+    has_transactions = db.query(models.Transaction.id).first() is not None
+    if has_transactions and not has_rollups:
+        rebuild(db)
+
+
+if __name__ == "__main__":
+    # Usage: python -m app.rollups [rebuild|verify]
+    from .database import SessionLocal, engine
+
+    models.Base.metadata.create_all(bind=engine)
+    command = sys.argv[1] if len(sys.argv) > 1 else "rebuild"
+    db = SessionLocal()
+    try:
+        if command == "rebuild":
+            rebuild(db)
+        elif command != "verify":
+            sys.exit(f"Unknown command: {command}")
+        problems = verify(db)
+        for problem in problems:
+            print(problem)
+        print(f"{len(problems)} mismatched buckets")
+        sys.exit(1 if problems else 0)
+    finally:
+        db.close()
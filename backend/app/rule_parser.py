@@ -0,0 +1,167 @@
+# Deterministic local transaction parser, tried before the LLM
+import re
+from typing import Optional, Tuple
+
+# Matched against whole words of the lower-cased input; the longest matching
+# phrase wins, so "uber eats" beats "uber" and "gas bill" beats "gas".
+KEYWORD_CATEGORIES = [
+    # Income
+    (("paycheck", "pay check", "salary", "payroll", "wages", "freelance", "deposit", "refund",
+      "reimbursement", "payment received", "got paid", "bonus", "dividend", "interest earned",
+      "venmo from", "cashback"), "Income"),
+    # Food & Drink
+    (("starbucks", "coffee", "cafe", "café", "latte", "dunkin", "tim hortons", "mcdonalds", "mcdonald's",
+      "burger king", "wendys", "chipotle", "subway", "taco bell", "kfc", "domino's", "dominos", "pizza",
+      "sushi", "restaurant", "lunch", "dinner", "breakfast", "brunch", "takeout", "doordash",
+      "uber eats", "ubereats", "grubhub", "groceries", "grocery", "supermarket", "whole foods",
+      "trader joe's", "trader joes", "safeway", "kroger", "aldi", "costco", "bakery", "bar", "beer",
+      "wine", "drinks", "snack", "food"), "Food & Drink"),
+    # Transportation
+    (("uber", "lyft", "taxi", "cab", "gas", "fuel", "shell", "chevron", "exxon", "parking", "toll",
+      "metro", "subway fare", "train", "bus", "amtrak", "flight", "airline", "airfare", "car wash",
+      "oil change", "mechanic", "transit", "scooter"), "Transportation"),
+    # Entertainment
+    (("netflix", "spotify", "hulu", "disney+", "hbo", "youtube premium", "movie", "movies", "cinema",
+      "theater", "theatre", "concert", "tickets", "ticket", "steam", "playstation", "xbox", "nintendo",
+      "video game", "game", "bowling", "museum", "festival"), "Entertainment"),
+    # Shopping
+    (("amazon", "target", "walmart", "ikea", "best buy", "apple store", "clothes", "clothing", "shoes",
+      "shirt", "jacket", "mall", "ebay", "etsy", "nike", "zara", "h&m", "gift", "books", "book",
+      "electronics", "furniture"), "Shopping"),
+    # Bills & Utilities
+    (("rent", "mortgage", "electric", "electricity", "water bill", "gas bill", "internet", "wifi",
+      "phone bill", "utilities", "utility", "insurance", "verizon", "at&t", "t-mobile", "comcast",
+      "xfinity", "cable", "subscription", "bill"), "Bills & Utilities"),
+    # Health
+    (("pharmacy", "cvs", "walgreens", "doctor", "dentist", "dental", "hospital", "clinic",
+      "prescription", "medicine", "therapy", "therapist", "gym", "fitness", "yoga", "vitamins",
+      "copay"), "Health"),
+]
+
+_KEYWORD_PATTERNS = [
+    (re.compile(r"(?<![\w])(?:" + "|".join(re.escape(k) for k in keywords) + r")(?![\w])"), category)
+    for keywords, category in KEYWORD_CATEGORIES
+]
+
+# "$1,234.56", "$ 8", "1234.5", "2,500" - the $ form is preferred when present
+_DOLLAR_AMOUNT = re.compile(r"\$\s*(\d{1,3}(?:,\d{3})+|\d+)(?:\.(\d{1,2}))?(?![\d.])")
+_BARE_AMOUNT = re.compile(r"(?<![\w.,$])(\d{1,3}(?:,\d{3})+|\d+)(?:\.(\d{1,2}))?(?![\w.,])")
+_CURRENCY_WORDS = re.compile(r"(?<![\w])(?:usd|dollars?|bucks)(?![\w])", re.IGNORECASE)
+_FILLER_EDGES = re.compile(r"^(?:[\s\-:,.@]|(?:for|at|on|of)\s)+|(?:[\s\-:,.@]|\s(?:for|at|on|of))+$", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+_ANY_NUMBER = re.compile(r"\$?\s*\d[\d,]*(?:\.\d+)?")
+
+_UNITS = {
+    "zero": 0, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6,
+    "seven": 7, "eight": 8, "nine": 9, "ten": 10, "eleven": 11, "twelve": 12, "thirteen": 13,
+    "fourteen": 14, "fifteen": 15, "sixteen": 16, "seventeen": 17, "eighteen": 18, "nineteen": 19,
+    "twenty": 20, "thirty": 30, "forty": 40, "fifty": 50, "sixty": 60, "seventy": 70, "eighty": 80,
+    "ninety": 90,
+}
+_SCALES = {"hundred": 100, "thousand": 1000}
+_NUMBER_WORD = "|".join(list(_UNITS) + list(_SCALES) + ["a", "an", "and"])
+_WRITTEN_AMOUNT = re.compile(
+    r"(?<![\w])((?:(?:" + _NUMBER_WORD + r")[\s-]+)*(?:" + _NUMBER_WORD + r"))[\s-]+(?:dollars?|bucks)(?![\w])",
+    re.IGNORECASE,
+)
+
+# Rule results at or above this confidence are returned without calling the LLM
+MIN_CONFIDENCE = 0.8
+
+
+def parse(user_input: str) -> Tuple[Optional[dict], float]:
+    """
+    Parse a transaction locally.
+
+    Returns (data, confidence) where data has the same shape as the LLM result,
+    or (None, 0.0) when no amount could be found.
+    """
+    text = user_input.strip()
+    amount, span = _extract_amount(text)
+    if amount is None:
+        return None, 0.0
+
+    description = _clean_description(text[:span[0]] + " " + text[span[1]:])
+    category = categorize(description or text)
+
+    confidence = 0.9 if category else 0.4
+    if not description:
+        confidence = min(confidence, 0.5)
+
+    category = category or "Other"
+    return {
+        "amount": amount,
+        "description": description or text,
+        "category": category,
+        "transaction_type": "income" if category == "Income" else "expense",
+    }, confidence
+
+
+def categorize(text: str) -> Optional[str]:
+    """Get the category for a description from the keyword dictionary, if any keyword matches."""
+    lowered = text.lower()
+    best, best_length = None, 0
+    for pattern, category in _KEYWORD_PATTERNS:
+        for match in pattern.finditer(lowered):
+            if len(match.group(0)) > best_length:
+                best, best_length = category, len(match.group(0))
+    return best
+
+
+def extract_amount(text: str) -> Optional[float]:
+    """Get the dollar amount mentioned in text, if there is exactly one obvious candidate."""
+    return _extract_amount(text)[0]
+
+
+def mask_amounts(text: str, mask: str = "#") -> str:
+    """Replace every amount in text (numeric or written, with any currency words) with mask."""
+    text = _WRITTEN_AMOUNT.sub(f" {mask} ", text)
+    text = _ANY_NUMBER.sub(f" {mask} ", text)
+    return _CURRENCY_WORDS.sub(" ", text)
+
+
+def _extract_amount(text: str) -> Tuple[Optional[float], Tuple[int, int]]:
+    match = _DOLLAR_AMOUNT.search(text)
+    if match is None:
+        bare = list(_BARE_AMOUNT.finditer(text))
+        if len(bare) == 1:
+            match = bare[0]
+    if match is not None:
+        whole, cents = match.group(1), match.group(2)
+        amount = float(whole.replace(",", "") + "." + (cents or "0"))
+        return (amount if amount > 0 else None), match.span()
+
+    match = _WRITTEN_AMOUNT.search(text)
+    if match is not None:
+        amount = _words_to_number(match.group(1))
+        if amount:
+            return float(amount), match.span()
+    return None, (0, 0)
+
+
+def _words_to_number(words: str) -> Optional[int]:
+    total = current = 0
+    for word in re.split(r"[\s-]+", words.lower()):
+        if word in ("a", "an", "and"):
+            # "a hundred" is handled by the implicit 1 in front of a scale
+            continue
+        if word in _UNITS:
+            current += _UNITS[word]
+        elif word == "hundred":
+            current = (current or 1) * 100
+        elif word in _SCALES:
+            total += (current or 1) * _SCALES[word]
+            current = 0
+        else:
+            return None
+    return total + current
+
+
+def _clean_description(text: str) -> str:
+    text = _CURRENCY_WORDS.sub(" ", text)
+    text = _WHITESPACE.sub(" ", text).strip()
+    previous = None
+    while previous != text:
+        previous = text
+        text = _FILLER_EDGES.sub("", text).strip()
+    return text[:1].upper() + text[1:]
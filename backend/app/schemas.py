@@ -1,6 +1,7 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 from datetime import datetime
-from typing import Optional, List
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Any, Dict, Optional, List
 
 
 # ============== Category Schemas ==============
@@ -21,29 +22,120 @@ class Category(CategoryBase):
         from_attributes = True
 
 
+# ============== Money ==============
+
+# Amounts are stored as integer cents; the API speaks decimal amounts
+
+def to_cents(amount: float) -> int:
+    # Half up on the decimal the float prints as, so 1.005 is 101 cents
+    # (round() would give 100: the float is 1.00499... and ties go to even)
+    return int((Decimal(str(amount)) * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def from_cents(cents: int) -> float:
+    return cents / 100
+
+
+# Largest accepted amount: a float holds every cent exactly only up to ~9e13,
+# and the cents must fit a 64-bit column
+MAX_AMOUNT = 1_000_000_000_000
+
+
 # ============== Transaction Schemas ==============
 
 class TransactionBase(BaseModel):
-    amount: float = Field(..., gt=0, description="Transaction amount (must be positive)")
+    amount: float = Field(..., gt=0, le=MAX_AMOUNT, allow_inf_nan=False, description="Transaction amount (must be positive)")
     description: str = Field(..., min_length=1, max_length=255)
     transaction_type: str = Field(default="expense", pattern="^(expense|income)$")
     date: datetime
     category_id: int
 
+    @field_validator("date")
+    @classmethod
+    def drop_timezone(cls, value: datetime) -> datetime:
+        # Dates are stored as naive wall-clock times on every database backend
+        return value.replace(tzinfo=None)
+
 
 class TransactionCreate(TransactionBase):
-    pass
+    @field_validator("amount")
+    @classmethod
+    def at_least_one_cent(cls, value: float) -> float:
+        if to_cents(value) < 1:
+            raise ValueError("amount must be at least 0.01")
+        return value
+
+    @property
+    def amount_cents(self) -> int:
+        return to_cents(self.amount)
 
 
 class Transaction(TransactionBase):
+    amount: float = Field(..., gt=0, validation_alias="amount_cents")
     id: int
     created_at: datetime
     category: Category
 
+    @field_validator("amount", mode="before")
+    @classmethod
+    def amount_from_cents(cls, value: int) -> float:
+        return from_cents(value)
+
     class Config:
         from_attributes = True
 
 
+class TransactionBulkCreate(BaseModel):
+    # Rows are validated one by one so best_effort can keep the valid ones
+    transactions: List[Dict[str, Any]] = Field(..., min_length=1, max_length=100000)
+    mode: str = Field(default="atomic", pattern="^(atomic|best_effort)$")
+
+
+class BulkRowError(BaseModel):
+    index: int
+    error: str
+
+
+class TransactionBulkResult(BaseModel):
+    created: int
+    ids: List[Optional[int]]  # In input order; None for rejected rows
+    errors: List[BulkRowError]
+
+
+class TransactionPage(BaseModel):
+    items: List[Transaction]
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
+
+
+# ============== Import Schemas ==============
+
+class ImportProfile(BaseModel):
+    """Column mapping for CSV statement imports."""
+    delimiter: str = Field(default=",", min_length=1, max_length=1)
+    date_column: str = "Date"
+    date_format: Optional[str] = None  # strptime format; ISO and common formats are tried if unset
+    description_columns: List[str] = ["Description"]  # Joined with spaces
+    amount_column: Optional[str] = "Amount"  # Signed amount; set to None to use debit/credit columns
+    debit_column: Optional[str] = None
+    credit_column: Optional[str] = None
+    expenses_positive: bool = False  # True if the amount column shows spending as positive numbers
+
+
+class ImportJob(BaseModel):
+    id: str
+    filename: str
+    format: str
+    status: str  # "pending", "running", "done" or "failed"
+    rows_read: int
+    created: int
+    failed: int
+    llm_categorized: int
+    errors: List[str]
+    started_at: datetime
+    finished_at: Optional[datetime] = None
+
+
 # ============== Analytics Schemas ==============
 
 class CategorySummary(BaseModel):
@@ -59,3 +151,30 @@ class AnalyticsSummary(BaseModel):
     total_expenses: float
     net_balance: float
     by_category: List[CategorySummary]
+
+
+# ============== Dashboard Schemas ==============
+
+class Dashboard(BaseModel):
+    change_token: int
+    full: bool  # False when transactions only holds rows changed since the given token
+    transactions: List[Transaction]
+    deleted_ids: List[int] = []
+    categories: List[Category]
+    summary: AnalyticsSummary
+
+
+# ============== Change Feed Schemas ==============
+
+class TransactionChange(BaseModel):
+    seq: int
+    op: str  # "create", "update" or "delete"
+    transaction_id: int
+    changed_at: Optional[datetime] = None
+    transaction: Optional[Transaction] = None  # None for deletes (tombstones)
+
+
+class ChangeFeed(BaseModel):
+    changes: List[TransactionChange]
+    last_seq: int  # Pass as `after` to continue
+    has_more: bool
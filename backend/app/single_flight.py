@@ -0,0 +1,48 @@
+# Single-flight: concurrent callers with the same key share one computation
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+
+class _Abandoned(Exception):
+    """Set on a flight whose computing caller was cancelled, so a waiter takes over."""
+
+
+class SingleFlight:
+    """
+    Computations in progress on the event loop, keyed by input.
+
+    A caller whose key is already being computed waits for that result
+    instead of starting its own. A waiter that is cancelled leaves the
+    computation running for the others; if the computing caller is
+    cancelled, a waiter takes over.
+    """
+
+    def __init__(self):
+        self._flights: Dict[Hashable, asyncio.Future] = {}
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    async def run(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Return compute()'s result for key, and whether it came from another caller's computation."""
+        while True:
+            flight = self._flights.get(key)
+            if flight is None:
+                break
+            try:
+                return await asyncio.shield(flight), True
+            except _Abandoned:
+                continue
+
+        flight = asyncio.get_running_loop().create_future()
+        self._flights[key] = flight
+        try:
+            result = await compute()
+        except BaseException as e:
+            flight.set_exception(_Abandoned() if isinstance(e, asyncio.CancelledError) else e)
+            flight.exception()  # Mark retrieved when nobody was waiting
+            raise
+        finally:
+            del self._flights[key]
+        flight.set_result(result)
+        return result, False
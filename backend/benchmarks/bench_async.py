@@ -0,0 +1,59 @@
+# API requests/sec at 50, 200 and 1000 concurrent clients
+#
+# Mix: 60% transaction list, 30% analytics summary, 10% create. The server is
+# a single uvicorn worker on a throwaway SQLite database.
+#
+# Usage (from backend/): python -m benchmarks.bench_async [--clients 50,200,1000] [--duration 15]
+import argparse
+import asyncio
+from datetime import datetime, timedelta
+
+from . import common
+from .load import run_load, serve
+
+SEED_ROWS = 10000
+
+
+def mix(category_ids):
+    def create(rng):
+        return "POST", "/api/transactions", {
+            "amount": rng.randint(100, 20000) / 100,
+            "description": "Benchmark purchase",
+            "date": (common.LEDGER_END - timedelta(days=rng.randint(0, 60))).isoformat(),
+            "category_id": rng.choice(category_ids),
+        }
+
+    def summary(rng):
+        # Whole months, so repeated ranges can be served from the analytics cache
+        month = datetime(2024, rng.randint(1, 12), 1)
+        return "GET", f"/api/analytics/summary?start_date={month.isoformat()}", None
+
+    return [
+        (60, lambda rng: ("GET", "/api/transactions?limit=100", None)),
+        (30, summary),
+        (10, create),
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure API throughput under concurrent clients.")
+    parser.add_argument("--clients", default="50,200,1000", help="Comma-separated client counts")
+    parser.add_argument("--duration", type=float, default=15, help="Seconds per run")
+    args = parser.parse_args()
+
+    common.setup_database()
+    common.seed(SEED_ROWS)
+    print(f"{'clients':>8}{'req/s':>10}{'p50':>11}{'p99':>11}{'errors':>8}")
+    with serve() as base_url:
+        import httpx
+        category_ids = [c["id"] for c in httpx.get(base_url + "/api/categories").json() if c["name"] != "Income"]
+        for clients in (int(c) for c in args.clients.split(",")):
+            result = asyncio.run(run_load(base_url, clients, args.duration, mix(category_ids)))
+            print(
+                f"{clients:>8}{result['requests_per_second']:>10.0f}{result['p50_ms']:>9.0f}ms"
+                f"{result['p99_ms']:>9.0f}ms{result['errors']:>8}"
+            )
+
+
+if __name__ == "__main__":
+    main()
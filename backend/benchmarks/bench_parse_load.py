@@ -0,0 +1,94 @@
+# CRUD latency with and without 200 /api/parse requests in flight
+#
+# The parses go to a local fake OpenAI server (benchmarks/fake_openai.py)
+# whose latency outlasts the measurement, so all of them are waiting on the
+# upstream while CRUD clients list transactions and create one now and then.
+# Every parse input is new, so none is answered by the rules, the cache or the
+# categorizer. The CRUD p99 should match the run without parses.
+#
+# Usage (from backend/): python -m benchmarks.bench_parse_load [--parses 200] [--crud-clients 20] [--latency 30] [--duration 15]
+import argparse
+import asyncio
+import string
+from datetime import timedelta
+
+import httpx
+
+from . import common
+from .load import run_load, serve
+
+SEED_ROWS = 10000
+
+
+def crud_mix(category_ids):
+    def create(rng):
+        return "POST", "/api/transactions", {
+            "amount": rng.randint(100, 20000) / 100,
+            "description": "Benchmark purchase",
+            "date": (common.LEDGER_END - timedelta(days=rng.randint(0, 60))).isoformat(),
+            "category_id": rng.choice(category_ids),
+        }
+
+    return [
+        (90, lambda rng: ("GET", "/api/transactions?limit=100", None)),
+        (10, create),
+    ]
+
+
+def parse_mix():
+    def parse(rng):
+        # A made-up word the rules don't know, so every parse goes upstream
+        word = "".join(rng.choices(string.ascii_lowercase, k=10))
+        return "POST", "/api/parse", {"text": f"{word} {rng.randint(1, 500)}"}
+
+    return [(1, parse)]
+
+
+def print_row(label, result):
+    print(
+        f"{label:>26}{result['requests_per_second']:>10.0f}{result['p50_ms']:>9.0f}ms"
+        f"{result['p99_ms']:>9.0f}ms{result['errors']:>8}"
+    )
+
+
+async def measure(base_url, args, category_ids):
+    print(f"{'':>26}{'req/s':>10}{'p50':>11}{'p99':>11}{'errors':>8}")
+    print_row("crud alone", await run_load(base_url, args.crud_clients, args.duration, crud_mix(category_ids)))
+
+    # Start the parses, let their requests arrive, then measure CRUD while
+    # they all wait on the upstream
+    parses = asyncio.create_task(run_load(base_url, args.parses, args.settle + args.duration, parse_mix(), seed=2))
+    await asyncio.sleep(args.settle)
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        in_flight = (await client.get("/api/parse/stats")).json()["coalescing"]["in_flight"]
+    crud = await run_load(base_url, args.crud_clients, args.duration, crud_mix(category_ids))
+    print_row(f"crud, {in_flight} parses waiting", crud)
+    print_row("parses", await parses)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure CRUD latency while parses wait on OpenAI.")
+    parser.add_argument("--parses", type=int, default=200, help="Concurrent parse clients")
+    parser.add_argument("--crud-clients", type=int, default=20, help="Concurrent CRUD clients")
+    parser.add_argument("--latency", type=float, default=30, help="Fake OpenAI latency in seconds")
+    parser.add_argument("--settle", type=float, default=5, help="Seconds between starting the parses and measuring")
+    parser.add_argument("--duration", type=float, default=15, help="Seconds per CRUD run")
+    args = parser.parse_args()
+
+    common.setup_database()
+    common.seed(SEED_ROWS)
+    with serve("benchmarks.fake_openai:app", FAKE_OPENAI_LATENCY=str(args.latency)) as fake_url:
+        # Enough OpenAI slots and a long enough deadline that every parse is
+        # really waiting on the upstream, not on the worker
+        with serve(
+            OPENAI_BASE_URL=fake_url + "/v1",
+            OPENAI_API_KEY="fake",
+            OPENAI_MAX_CONCURRENCY=str(args.parses),
+            OPENAI_TIMEOUT=str(args.latency * 2),
+        ) as base_url:
+            category_ids = [c["id"] for c in httpx.get(base_url + "/api/categories").json() if c["name"] != "Income"]
+            asyncio.run(measure(base_url, args, category_ids))
+
+
+if __name__ == "__main__":
+    main()
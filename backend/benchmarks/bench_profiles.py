@@ -0,0 +1,79 @@
+# SQLite engine profiles (NONNA_DB_PROFILE) under concurrent mixed reads and writes
+#
+# Mix: 45% transaction list, 25% analytics summary, 20% create, 10% update.
+# Each profile gets its own copy of the same seeded database, in rollback
+# journal mode; the tuned profile switches its copy to WAL on connect.
+#
+# Usage (from backend/): python -m benchmarks.bench_profiles [--profiles default,tuned] [--clients 10,50,200] [--duration 15]
+import argparse
+import asyncio
+import os
+import sqlite3
+from datetime import timedelta
+
+from . import common
+from .load import run_load, serve
+
+from app.database import ENGINE_PROFILES, engine
+
+SEED_ROWS = 10000
+
+
+def mix(category_ids):
+    def body(rng):
+        return {
+            "amount": rng.randint(100, 20000) / 100,
+            "description": "Benchmark purchase",
+            "date": (common.LEDGER_END - timedelta(days=rng.randint(0, 60))).isoformat(),
+            "category_id": rng.choice(category_ids),
+        }
+
+    return [
+        (45, lambda rng: ("GET", "/api/transactions?limit=100", None)),
+        (25, lambda rng: ("GET", "/api/analytics/summary", None)),
+        (20, lambda rng: ("POST", "/api/transactions", body(rng))),
+        (10, lambda rng: ("PUT", f"/api/transactions/{rng.randint(1, SEED_ROWS)}", body(rng))),
+    ]
+
+
+def copy_database(profile: str) -> str:
+    """Copy the seeded database for one profile, back in rollback journal mode."""
+    source_path = engine.url.database
+    path = os.path.join(common.DATABASE_DIR, f"{profile}.db")
+    source, target = sqlite3.connect(source_path), sqlite3.connect(path)
+    try:
+        source.backup(target)
+        target.execute("PRAGMA journal_mode=DELETE")
+    finally:
+        source.close()
+        target.close()
+    return path
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare SQLite engine profiles under mixed load.")
+    parser.add_argument("--profiles", default=",".join(ENGINE_PROFILES), help="Comma-separated profiles")
+    parser.add_argument("--clients", default="10,50,200", help="Comma-separated client counts")
+    parser.add_argument("--duration", type=float, default=15, help="Seconds per run")
+    args = parser.parse_args()
+
+    common.setup_database()
+    common.seed(SEED_ROWS)
+    engine.dispose()
+
+    print(f"{'profile':>8}{'clients':>8}{'req/s':>10}{'p50':>11}{'p99':>11}{'errors':>8}")
+    for profile in args.profiles.split(","):
+        path = copy_database(profile)
+        with serve(DATABASE_URL=f"sqlite:///{path}", NONNA_DB_PROFILE=profile) as base_url:
+            import httpx
+            category_ids = [c["id"] for c in httpx.get(base_url + "/api/categories").json() if c["name"] != "Income"]
+            for clients in (int(c) for c in args.clients.split(",")):
+                result = asyncio.run(run_load(base_url, clients, args.duration, mix(category_ids)))
+                print(
+                    f"{profile:>8}{clients:>8}{result['requests_per_second']:>10.0f}{result['p50_ms']:>9.0f}ms"
+                    f"{result['p99_ms']:>9.0f}ms{result['errors']:>8}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# Analytics summary latency: Python aggregation over ORM rows vs SQL vs rollups
+#
+# Usage (from backend/): python -m benchmarks.bench_summary [--sizes 10000,100000,1000000]
+import argparse
+import statistics
+import time
+from datetime import datetime
+
+from . import common
+from app import crud, models, rollups, schemas
+from app.category_registry import registry as category_registry
+from app.database import SessionLocal
+
+# A range with partial days at both edges, so every rollup path is exercised
+RANGE = (datetime(2024, 2, 10, 12, 0), datetime(2024, 9, 20, 18, 0))
+
+
+def python_summary(db, start_date=None, end_date=None) -> schemas.AnalyticsSummary:
+    """The original implementation: load every row and aggregate in Python."""
+    query = db.query(models.Transaction)
+    if start_date:
+        query = query.filter(models.Transaction.date >= start_date)
+    if end_date:
+        query = query.filter(models.Transaction.date <= end_date)
+    totals = {}
+    for t in query.all():
+        key = (t.transaction_type, t.category_id)
+        total, count = totals.get(key, (0, 0))
+        # Touch the relationship like the original did per expense row
+        t.category.name
+        totals[key] = (total + t.amount_cents, count + 1)
+    rows = [(t_type, c, total, count) for (t_type, c), (total, count) in totals.items()]
+    return crud._build_summary(rows, category_registry.by_id(db))
+
+
+def sql_summary(db, start_date=None, end_date=None) -> schemas.AnalyticsSummary:
+    """One GROUP BY over the raw table, without the rollups."""
+    rows = rollups._combine(rollups._raw_rows(db, start_date, end_date))
+    return crud._build_summary(rows, category_registry.by_id(db))
+
+
+def rollup_summary(db, start_date=None, end_date=None) -> schemas.AnalyticsSummary:
+    return crud.get_analytics_summary(db, start_date=start_date, end_date=end_date)
+
+
+def measure(fn, repeats: int, **kwargs) -> float:
+    """Median wall time of fn in milliseconds, each run in a fresh session."""
+    timings = []
+    for _ in range(repeats):
+        db = SessionLocal()
+        try:
+            started = time.perf_counter()
+            fn(db, **kwargs)
+            timings.append((time.perf_counter() - started) * 1000)
+        finally:
+            db.close()
+    return statistics.median(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Time the analytics summary at growing ledger sizes.")
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="Comma-separated ledger sizes")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    common.setup_database()
+    variants = [("python", python_summary), ("sql", sql_summary), ("rollups", rollup_summary)]
+    print(f"{'rows':>9}  {'range':<6}" + "".join(f"{name:>12}" for name, _ in variants) + "   speedup")
+    for size in sorted(int(s) for s in args.sizes.split(",")):
+        common.seed(size - common.row_count())
+        for label, (start_date, end_date) in (("all", (None, None)), ("edges", RANGE)):
+            # Same answer from every variant before timing them
+            db = SessionLocal()
+            try:
+                expected = python_summary(db, start_date, end_date)
+                for name, fn in variants[1:]:
+                    assert fn(db, start_date, end_date) == expected, name
+            finally:
+                db.close()
+            timings = [measure(fn, args.repeats, start_date=start_date, end_date=end_date) for _, fn in variants]
+            print(
+                f"{size:>9}  {label:<6}" + "".join(f"{t:>10.1f}ms" for t in timings)
+                + f"   {timings[0] / timings[-1]:>6.0f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+# Shared setup for the benchmarks: a throwaway SQLite database with synthetic transactions
+#
+# Import this before any app module; the app binds its engines to DATABASE_URL
+# at import time.
+import os
+import random
+import tempfile
+from datetime import datetime, timedelta
+
+DATABASE_DIR = tempfile.mkdtemp(prefix="nonna-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(DATABASE_DIR, 'bench.db')}"
+os.environ.setdefault("OPENAI_API_KEY", "unused")
+
+from sqlalchemy import insert  # noqa: E402
+
+from app import crud, migrations, models, rollups  # noqa: E402
+from app.database import SessionLocal, engine  # noqa: E402
+
+# Synthetic ledger: two years of transactions ending here
+LEDGER_END = datetime(2024, 12, 31, 23, 0)
+LEDGER_DAYS = 730
+
+_INSERT_CHUNK = 50000
+
+
+def setup_database() -> None:
+    """Create the schema and the default categories."""
+    models.Base.metadata.create_all(bind=engine)
+    migrations.migrate(engine)
+    db = SessionLocal()
+    try:
+        crud.create_default_categories(db)
+    finally:
+        db.close()
+
+
+def seed(rows: int, seed: int = 42) -> None:
+    """Append rows random transactions and rebuild the rollups."""
+    rng = random.Random(seed)
+    db = SessionLocal()
+    try:
+        categories = {c.name: c.id for c in db.query(models.Category)}
+        expense_ids = [i for name, i in categories.items() if name != "Income"]
+        for start in range(0, rows, _INSERT_CHUNK):
+            batch = []
+            for _ in range(min(_INSERT_CHUNK, rows - start)):
+                income = rng.random() < 0.05
+                batch.append({
+                    "amount_cents": rng.randint(100_000, 500_000) if income else rng.randint(100, 20_000),
+                    "description": "Paycheck" if income else f"Purchase {rng.randint(1, 5000)}",
+                    "transaction_type": "income" if income else "expense",
+                    "date": LEDGER_END - timedelta(minutes=rng.randint(0, LEDGER_DAYS * 24 * 60)),
+                    "category_id": categories["Income"] if income else rng.choice(expense_ids),
+                })
+            db.execute(insert(models.Transaction), batch)
+        db.commit()
+        rollups.rebuild(db)
+    finally:
+        db.close()
+
+
+def row_count() -> int:
+    db = SessionLocal()
+    try:
+        return db.query(models.Transaction).count()
+    finally:
+        db.close()
@@ -0,0 +1,75 @@
+# Local stand-in for the OpenAI chat completions API, with injected latency and errors
+#
+# Answers the forced tool calls ai_parser makes: every input becomes an
+# "Other" expense of the first number in it. Run it with benchmarks.load.serve
+# and point the app at it with OPENAI_BASE_URL.
+#
+#   FAKE_OPENAI_LATENCY     seconds before each response (default 0.5)
+#   FAKE_OPENAI_ERROR_RATE  share of calls answered with a 500 (default 0)
+import asyncio
+import json
+import os
+import random
+import re
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+LATENCY = float(os.getenv("FAKE_OPENAI_LATENCY", "0.5"))
+ERROR_RATE = float(os.getenv("FAKE_OPENAI_ERROR_RATE", "0"))
+
+_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+_NUMBERED_LINE = re.compile(r"^(\d+)\. (.*)$")
+
+app = FastAPI()
+
+
+def _transaction(text: str) -> dict:
+    amount = _NUMBER.search(text)
+    return {
+        "amount": float(amount.group()) if amount else 1.0,
+        "description": _NUMBER.sub("", text).strip(" $") or "Purchase",
+        "category": "Other",
+        "transaction_type": "expense",
+    }
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    await asyncio.sleep(LATENCY)
+    if random.random() < ERROR_RATE:
+        return JSONResponse({"error": {"message": "Injected failure", "type": "server_error"}}, status_code=500)
+
+    tool = body["tool_choice"]["function"]["name"]
+    content = body["messages"][-1]["content"]
+    if tool == "record_transactions":
+        items = []
+        for line in content.splitlines():
+            match = _NUMBERED_LINE.match(line)
+            if match:
+                items.append({"line": int(match.group(1)), **_transaction(json.loads(match.group(2)))})
+        arguments = {"transactions": items}
+    else:
+        arguments = _transaction(content)
+
+    return {
+        "id": "chatcmpl-fake",
+        "object": "chat.completion",
+        "created": 0,
+        "model": body["model"],
+        "choices": [{
+            "index": 0,
+            "finish_reason": "stop",
+            "message": {
+                "role": "assistant",
+                "content": None,
+                "tool_calls": [{
+                    "id": "call-fake",
+                    "type": "function",
+                    "function": {"name": tool, "arguments": json.dumps(arguments)},
+                }],
+            },
+        }],
+        "usage": {"prompt_tokens": 100, "completion_tokens": 30, "total_tokens": 130},
+    }
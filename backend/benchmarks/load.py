@@ -0,0 +1,85 @@
+# HTTP load generation against a uvicorn server running the app
+import asyncio
+import contextlib
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, List, Tuple
+
+import httpx
+
+# (weight, make request) pairs; a request is (method, path, json body or None)
+Mix = List[Tuple[int, Callable[[random.Random], Tuple[str, str, dict]]]]
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@contextlib.contextmanager
+def serve(app: str = "app.main:app", **env):
+    """Run an ASGI app under uvicorn in a subprocess (env overrides the current environment)."""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", app, "--port", str(port),
+         "--log-level", "warning", "--backlog", "4096"],
+        cwd=BACKEND_DIR,
+        env={**os.environ, **env},
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                httpx.get(base_url + "/")
+                break
+            except httpx.TransportError:
+                if time.monotonic() > deadline or server.poll() is not None:
+                    raise RuntimeError("server did not start")
+                time.sleep(0.2)
+        yield base_url
+    finally:
+        server.terminate()
+        server.wait()
+
+
+async def run_load(base_url: str, clients: int, duration: float, mix: Mix, seed: int = 1) -> Dict[str, float]:
+    """Drive the server with `clients` concurrent clients for `duration` seconds."""
+    weights = [weight for weight, _ in mix]
+    makers = [make for _, make in mix]
+    latencies: List[float] = []
+    errors = 0
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        deadline = time.monotonic() + duration
+
+        async def worker(rng: random.Random):
+            nonlocal errors
+            while time.monotonic() < deadline:
+                method, path, body = rng.choices(makers, weights)[0](rng)
+                started = time.perf_counter()
+                try:
+                    response = await client.request(method, path, json=body)
+                    ok = response.status_code < 400
+                except httpx.HTTPError:
+                    ok = False
+                if ok:
+                    latencies.append(time.perf_counter() - started)
+                else:
+                    errors += 1
+
+        started = time.monotonic()
+        await asyncio.gather(*(worker(random.Random(seed * 100003 + i)) for i in range(clients)))
+        elapsed = time.monotonic() - started
+
+    latencies.sort()
+    return {
+        "requests_per_second": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000 if latencies else float("nan"),
+        "p99_ms": latencies[int(len(latencies) * 0.99)] * 1000 if latencies else float("nan"),
+        "errors": errors,
+    }
@@ -0,0 +1,85 @@
+# Every test gets an empty database with the default categories, and fresh in-process caches
+import asyncio
+import os
+import tempfile
+
+import pytest
+
+# The app binds its engines to DATABASE_URL at import time. Set
+# TEST_DATABASE_URL to run the suite against another database, e.g.
+# postgresql+psycopg://postgres@localhost/nonna_test (its tables are dropped)
+os.environ["DATABASE_URL"] = os.getenv("TEST_DATABASE_URL") or (
+    f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='nonna-test-'), 'test.db')}"
+)
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+import httpx  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+from app import main, migrations, models  # noqa: E402
+from app.analytics_cache import cache as analytics_cache  # noqa: E402
+from app.categorizer import categorizer  # noqa: E402
+from app.category_registry import registry as category_registry  # noqa: E402
+from app.database import async_engine, engine  # noqa: E402
+from app.parse_cache import cache as parse_cache  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def database():
+    """Recreate the schema and run the app's startup steps."""
+    models.Base.metadata.drop_all(bind=engine)
+    models.Base.metadata.create_all(bind=engine)
+    migrations.migrate(engine)
+    for cache in (category_registry, analytics_cache, parse_cache, categorizer):
+        cache.__init__()
+    main.startup_event()
+    yield
+    engine.dispose()
+
+
+@pytest.fixture
+def db():
+    session = Session(bind=engine)
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def queries():
+    """SQL statements executed on either engine while the test runs."""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engines = (engine, async_engine.sync_engine)
+    for e in engines:
+        event.listen(e, "before_cursor_execute", record)
+    yield statements
+    for e in engines:
+        event.remove(e, "before_cursor_execute", record)
+
+
+@pytest.fixture
+def call_api():
+    """
+    Run `await fn(client)` on a fresh event loop, with an httpx client bound to
+    the app, and return its result. Async engine connections are closed
+    afterwards since they belong to that loop.
+    """
+    def run(fn):
+        async def session():
+            transport = httpx.ASGITransport(app=main.app)
+            try:
+                async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                    return await fn(client)
+            finally:
+                await async_engine.dispose()
+        return asyncio.run(session())
+    return run
+
+
+@pytest.fixture
+def category_ids(db):
+    return {c.name: c.id for c in db.query(models.Category)}
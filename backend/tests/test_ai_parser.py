@@ -0,0 +1,36 @@
+# Batch parse results are matched to their lines by number, not position
+import asyncio
+
+from app import ai_parser
+
+LINES = ["thing from ana 12", "zorblax 40", "birthday thing 25", "misc stuff 9.99"]
+
+
+def _item(line, description, category):
+    return {"line": line, "amount": 10, "description": description, "category": category, "transaction_type": "expense"}
+
+
+def test_batch_items_are_matched_by_line(monkeypatch):
+    async def call_tool(path, tool, user_content, max_tokens, lines=1, timeout=None):
+        # Out of order, line 2 skipped and line 4 answered twice
+        return {"transactions": [
+            _item(3, "Birthday gift", "Shopping"),
+            _item(1, "Coffee", "Food & Drink"),
+            _item(4, "Gym", "Health"),
+            _item(4, "Gym membership", "Health"),
+        ]}
+    
+    monkeypatch.setattr(ai_parser, "_call_tool", call_tool)
+    results = asyncio.run(ai_parser.parse_batch(LINES))
+    
+    assert [r["success"] for r in results] == [True, False, True, False]
+    assert results[0]["data"]["description"] == "Coffee"
+    assert results[2]["data"]["category"] == "Shopping"
+    assert "line" not in results[0]["data"]
+    assert results[1]["error"] == "Missing item in AI response"
+    assert "Duplicate" in results[3]["error"]
+    
+    # Only matched results are cached
+    assert ai_parser.cache.get(LINES[0]) is not None
+    assert ai_parser.cache.get(LINES[1]) is None
+    assert ai_parser.cache.get(LINES[3]) is None
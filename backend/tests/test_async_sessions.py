@@ -0,0 +1,64 @@
+import asyncio
+from datetime import datetime
+
+from app import crud, database, schemas
+
+
+def test_more_concurrent_requests_than_pooled_connections(category_ids, call_api):
+    # 200 writers against a pool of 30 connections; requests wait for a checkout
+    body = {"amount": 4.5, "description": "Coffee", "date": "2024-03-05T08:00:00",
+            "category_id": category_ids["Food & Drink"]}
+
+    async def create(client):
+        return await asyncio.gather(*(client.post("/api/transactions", json=body) for _ in range(200)))
+
+    responses = call_api(create)
+    assert [r.status_code for r in responses] == [201] * 200
+    assert all(r.json()["category"]["name"] == "Food & Drink" for r in responses)
+
+
+def test_written_transactions_validate_without_queries(db, category_ids, queries):
+    # A lazy load inside model_validate switches greenlets in pydantic-core's
+    # native code under AsyncSession.run_sync, which crashes under load
+    date = datetime(2024, 3, 5, 8, 0)
+    created = crud.create_transaction(db, schemas.TransactionCreate(
+        amount=4.5, description="Coffee", date=date, category_id=category_ids["Food & Drink"],
+    ))
+    updated = crud.update_transaction(db, created.id, schemas.TransactionCreate(
+        amount=12, description="Taxi", date=date, category_id=category_ids["Transportation"],
+    ))
+
+    queries.clear()
+    schemas.Transaction.model_validate(created)
+    result = schemas.Transaction.model_validate(updated)
+    assert queries == []
+    assert result.category.name == "Transportation"
+
+
+def test_mixed_reads_and_writes_never_fail(category_ids, call_api, monkeypatch):
+    # A writer must not hold SQLite's lock while the event loop serves other
+    # requests; with a short busy_timeout that shows up as "database is locked"
+    monkeypatch.setitem(database.ENGINE_PROFILES[database.DB_PROFILE]["pragmas"], "busy_timeout", 200)
+    database.engine.dispose()
+    food = category_ids["Food & Drink"]
+    body = {"amount": 4.5, "description": "Coffee", "date": "2024-03-05T08:00:00", "category_id": food}
+    
+    async def mixed(client):
+        created = await asyncio.gather(*(client.post("/api/transactions", json=body) for _ in range(20)))
+        ids = [r.json()["id"] for r in created]
+        requests = []
+        for i in range(300):
+            kind = i % 10
+            if kind < 5:
+                requests.append(client.get("/api/transactions?limit=100"))
+            elif kind < 7:
+                requests.append(client.post("/api/transactions", json=body))
+            elif kind < 9:
+                requests.append(client.put(f"/api/transactions/{ids[i % len(ids)]}", json={**body, "amount": i}))
+            else:
+                requests.append(client.get("/api/analytics/summary"))
+        return await asyncio.gather(*requests, return_exceptions=True)
+    
+    responses = call_api(mixed)
+    failures = [r for r in responses if isinstance(r, Exception) or r.status_code >= 500]
+    assert failures == []
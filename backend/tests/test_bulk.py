@@ -0,0 +1,37 @@
+# Tests for bulk transaction creation
+from app import crud, models, schemas
+
+
+def _row(description, category_id, amount=12.5):
+    return {"amount": amount, "description": description, "date": "2024-03-05T12:00:00", "category_id": category_id}
+
+
+def test_bulk_ids_match_input_order(db, call_api, category_ids):
+    food = category_ids["Food & Drink"]
+    # Leave gaps in the id sequence so ids can't just be guessed from the row count
+    first = crud.create_transaction(db, schemas.TransactionCreate(**_row("Before", food)))
+    crud.delete_transaction(db, first.id)
+    
+    rows = [_row(f"Row {i}", food) for i in range(250)]
+    rows[7] = _row("Bad", food, amount=-1)
+    rows[100] = _row("Unknown category", 10**6)
+    response = call_api(lambda client: client.post(
+        "/api/transactions/bulk", json={"transactions": rows, "mode": "best_effort"},
+    ))
+    assert response.status_code == 201
+    result = response.json()
+    assert result["created"] == 248
+    assert [e["index"] for e in result["errors"]] == [7, 100]
+    assert result["ids"][7] is None and result["ids"][100] is None
+    
+    db.expire_all()
+    for index, transaction_id in enumerate(result["ids"]):
+        if transaction_id is not None:
+            assert db.get(models.Transaction, transaction_id).description == f"Row {index}"
+
+
+def test_atomic_bulk_rejects_everything_on_one_bad_row(db, call_api, category_ids):
+    rows = [_row("Fine", category_ids["Food & Drink"]), _row("Bad", category_ids["Food & Drink"], amount=0)]
+    response = call_api(lambda client: client.post("/api/transactions/bulk", json={"transactions": rows}))
+    assert response.status_code == 400
+    assert db.query(models.Transaction).count() == 0
@@ -0,0 +1,56 @@
+# Past transactions categorize similar descriptions, and corrections override keyword rules
+import asyncio
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from app import ai_parser, crud, schemas  # noqa: E402
+from app.categorizer import NeighbourCategorizer  # noqa: E402
+
+
+def test_predicts_the_category_of_similar_descriptions():
+    categorizer = NeighbourCategorizer()
+    categorizer.learn("Blue Bottle Coffee #123", "Food & Drink", "expense")
+    categorizer.learn("City Power & Light", "Bills & Utilities", "expense")
+
+    category, transaction_type, similarity = categorizer.predict("blue bottle coffee #987")
+    assert (category, transaction_type) == ("Food & Drink", "expense")
+    assert similarity > 0.9
+    assert categorizer.predict("Zorblax kiosk") is None
+    assert (categorizer.hits, categorizer.misses) == (1, 1)
+
+
+def test_threshold_and_relearning():
+    strict = NeighbourCategorizer(threshold=0.99)
+    strict.learn("Amazon", "Shopping", "expense")
+    assert strict.predict("Amazon order") is None
+    assert strict.predict("AMAZON")[0] == "Shopping"
+
+    # The newest decision for a description wins
+    strict.learn("amazon", "Food & Drink", "expense")
+    assert strict.predict("Amazon")[0] == "Food & Drink"
+    assert strict.stats()["entries"] == 1
+
+
+def test_oldest_descriptions_are_replaced_when_full():
+    categorizer = NeighbourCategorizer(max_entries=2, threshold=0.99)
+    for description in ("Netflix", "Spotify", "Hulu"):
+        categorizer.learn(description, "Entertainment", "expense")
+    assert categorizer.stats()["entries"] == 2
+    assert categorizer.predict("Netflix") is None
+    assert categorizer.predict("Hulu") is not None
+
+
+def test_correction_overrides_a_keyword_rule_for_the_same_description(db, category_ids):
+    crud.create_transaction(db, schemas.TransactionCreate(
+        amount=20, description="Amazon", date=datetime(2024, 3, 1), category_id=category_ids["Food & Drink"],
+    ))
+
+    corrected = asyncio.run(ai_parser.parse_transaction("Amazon $20"))["data"]
+    assert (corrected["category"], corrected["source"]) == ("Food & Drink", "neighbours")
+
+    # A merely similar description still goes by the keyword rule
+    other = asyncio.run(ai_parser.parse_transaction("Amazon order $35"))["data"]
+    assert (other["category"], other["source"]) == ("Shopping", "rules")
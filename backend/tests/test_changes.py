@@ -0,0 +1,81 @@
+# The change feed delivers every change once, in commit order
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import text
+
+from app import counters, crud, migrations, models, schemas
+from app.database import SessionLocal, engine
+
+
+def _transaction(description, category_id):
+    return schemas.TransactionCreate(
+        amount=5, description=description, date=datetime(2024, 3, 1, 12), category_id=category_id,
+    )
+
+
+def _drain(after):
+    db = SessionLocal()
+    try:
+        changes, _ = crud.get_changes(db, after=after)
+    finally:
+        db.close()
+    return [(c["seq"], c["transaction_id"]) for c in changes]
+
+
+def test_feed_never_skips_a_change_committed_late(category_ids):
+    food = category_ids["Food & Drink"]
+    
+    # A logs a change and stays open; B writes after it
+    slow = SessionLocal()
+    slow_transaction = models.Transaction(**crud._transaction_columns(_transaction("Slow", food)))
+    slow.add(slow_transaction)
+    slow.flush()
+    slow_id = slow_transaction.id
+    crud._log_change(slow, slow_id, "create")
+    slow.flush()
+    
+    def write_fast():
+        db = SessionLocal()
+        try:
+            crud.create_transaction(db, _transaction("Fast", food))
+        finally:
+            db.close()
+    fast = threading.Thread(target=write_fast)
+    fast.start()
+    time.sleep(0.3)
+    
+    # A reader polling now must not see B ahead of the still-open A
+    seen = _drain(after=0)
+    last_seq = seen[-1][0] if seen else 0
+    
+    slow.commit()
+    slow.close()
+    fast.join()
+    seen += _drain(after=last_seq)
+    
+    assert [seq for seq, _ in seen] == sorted(seq for seq, _ in seen)
+    assert slow_id in {transaction_id for _, transaction_id in seen}
+    assert len(seen) == 2
+
+
+def test_transactions_older_than_the_change_log_force_a_resync(db, call_api, category_ids):
+    crud.create_transaction(db, _transaction("Rent", category_ids["Bills & Utilities"]))
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM transaction_changes"))
+        conn.execute(text("DELETE FROM version_counters WHERE name LIKE 'changes%'"))
+        conn.execute(text("DELETE FROM schema_migrations WHERE version = 4"))
+    migrations.migrate(engine)
+    
+    assert counters.read(db, crud.CHANGE_HORIZON_COUNTER) == 1
+    gone = call_api(lambda client: client.get("/api/changes?after=0"))
+    assert gone.status_code == 410
+    assert gone.json()["detail"]["horizon"] == 1
+    dashboard = call_api(lambda client: client.get("/api/dashboard?since=0")).json()
+    assert dashboard["full"] and len(dashboard["transactions"]) == 1
+    assert gone.json()["detail"]["change_token"] == dashboard["change_token"] == 1
+    
+    # New writes continue after the horizon
+    created = crud.create_transaction(db, _transaction("Coffee", category_ids["Food & Drink"]))
+    assert _drain(after=1) == [(2, created.id)]
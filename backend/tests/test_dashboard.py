@@ -0,0 +1,35 @@
+# The dashboard is read from one snapshot
+from datetime import datetime
+
+from app import async_crud, crud, schemas
+from app.database import SessionLocal
+
+
+def _transaction(amount, category_id):
+    return schemas.TransactionCreate(
+        amount=amount, description="Groceries", date=datetime(2024, 3, 1, 12), category_id=category_id,
+    )
+
+
+def test_dashboard_reads_one_snapshot(db, call_api, category_ids, monkeypatch):
+    food = category_ids["Food & Drink"]
+    crud.create_transaction(db, _transaction(10, food))
+    get_categories = async_crud.get_categories
+    
+    async def commit_between_reads(session):
+        # Another request commits after the transactions were read but
+        # before the summary is
+        other = SessionLocal()
+        try:
+            crud.create_transaction(other, _transaction(25, food))
+        finally:
+            other.close()
+        return await get_categories(session)
+    
+    monkeypatch.setattr(async_crud, "get_categories", commit_between_reads)
+    response = call_api(lambda client: client.get("/api/dashboard"))
+    payload = response.json()
+    
+    assert [t["amount"] for t in payload["transactions"]] == [10]
+    assert payload["summary"]["total_expenses"] == 10
+    assert payload["change_token"] == crud.get_change_token(db) - 1
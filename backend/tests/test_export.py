@@ -0,0 +1,23 @@
+# Cached columnar exports outlive the responses that may still serve them
+import os
+import time
+
+import pytest
+
+from app import export
+
+pytest.importorskip("pyarrow")
+
+
+def test_superseded_exports_are_kept_while_recently_served(monkeypatch, tmp_path):
+    monkeypatch.setattr(export, "CACHE_DIR", str(tmp_path))
+    first = export.columnar_file("arrow", by_month=False, change_token=1, categories_version=1)
+    second = export.columnar_file("arrow", by_month=False, change_token=2, categories_version=1)
+    
+    # A response may still be about to open the first file
+    assert os.path.exists(first) and os.path.exists(second)
+    
+    expired = time.time() - export.STALE_EXPORT_GRACE - 1
+    os.utime(first, (expired, expired))
+    third = export.columnar_file("arrow", by_month=False, change_token=3, categories_version=1)
+    assert sorted(os.listdir(tmp_path)) == sorted(os.path.basename(p) for p in (second, third))
@@ -0,0 +1,51 @@
+# Statement imports report bad rows without aborting
+import asyncio
+import os
+import tempfile
+
+from app import crud, importer, schemas
+
+STATEMENT = (
+    "Date,Description,Amount\n"
+    "2024-03-01,Starbucks,-4.50\n"
+    "2024-03-02,Netflix\n"
+    "2024-03-03\n"
+    "2024-03-04,Uber ride,-12.00\n"
+)
+
+
+def test_short_csv_rows_are_row_errors(db):
+    fd, path = tempfile.mkstemp(suffix=".csv")
+    with os.fdopen(fd, "w") as f:
+        f.write(STATEMENT)
+    job = importer.create_job("statement.csv", "csv")
+    
+    asyncio.run(importer.run_import(job, path, schemas.ImportProfile()))
+    
+    assert job.status == "done", job.errors
+    assert (job.rows_read, job.created, job.failed) == (4, 2, 2)
+    assert job.errors == ["Row 3: missing Amount", "Row 4: missing Amount"]
+    assert sorted(t.description for t in crud.get_transactions(db)) == ["Starbucks", "Uber ride"]
+
+
+def test_income_rows_skip_the_llm_and_finished_jobs_expire(db, monkeypatch):
+    sent = []
+    
+    async def parse_batch(texts):
+        sent.extend(texts)
+        return [{"success": False} for _ in texts]
+    
+    monkeypatch.setattr(importer.ai_parser, "parse_batch", parse_batch)
+    fd, path = tempfile.mkstemp(suffix=".csv")
+    with os.fdopen(fd, "w") as f:
+        f.write("Date,Description,Amount\n2024-03-01,Zorblax transfer in,2500.00\n2024-03-02,Zorblax kiosk,-3.00\n")
+    job = importer.create_job("statement.csv", "csv")
+    
+    asyncio.run(importer.run_import(job, path, schemas.ImportProfile()))
+    
+    assert job.status == "done", job.errors
+    assert sent == ["Zorblax kiosk 3.00"]
+    assert importer.get_job(job.id) is job
+    
+    monkeypatch.setattr(importer, "IMPORT_JOB_TTL", -1)
+    assert importer.get_job(job.id) is None
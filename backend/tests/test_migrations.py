@@ -0,0 +1,65 @@
+from sqlalchemy import create_engine, inspect, text
+
+from app import main, migrations, models, rollups
+from app.database import engine
+
+
+def _transaction_indexes():
+    return {index["name"] for index in inspect(engine).get_indexes("transactions")}
+
+
+def test_fresh_database_has_every_migration_and_index():
+    with engine.connect() as conn:
+        applied = set(conn.scalars(text("SELECT version FROM schema_migrations")))
+    assert applied == {version for version, _, _ in migrations.MIGRATIONS}
+    assert {"ix_transactions_date_id", "ix_transactions_category_date"} <= _transaction_indexes()
+
+
+def test_unused_aggregation_index_is_dropped():
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE INDEX ix_transactions_type_date_category_amount "
+            "ON transactions (transaction_type, date, category_id, amount_cents)"
+        ))
+        conn.execute(text("DELETE FROM schema_migrations WHERE version = 3"))
+    migrations.migrate(engine)
+    assert "ix_transactions_type_date_category_amount" not in _transaction_indexes()
+
+
+def test_float_amounts_convert_to_cents_half_up(tmp_path):
+    # A database from before amounts were stored as cents
+    baseline = create_engine(f"sqlite:///{tmp_path / 'baseline.db'}")
+    with baseline.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE transactions (id INTEGER PRIMARY KEY, amount FLOAT NOT NULL, "
+            "description VARCHAR(255) NOT NULL, transaction_type VARCHAR(10), date DATETIME NOT NULL, "
+            "created_at DATETIME, category_id INTEGER NOT NULL)"
+        ))
+        conn.execute(text(
+            "INSERT INTO transactions (id, amount, description, transaction_type, date, category_id) "
+            "VALUES (1, 0.004, 'Rounding', 'expense', '2024-03-01', 1), (2, 0.125, 'Stamp', 'expense', '2024-03-01', 1), "
+            "(3, 1.005, 'Gum', 'expense', '2024-03-01', 1), (4, 19.99, 'Book', 'expense', '2024-03-01', 1)"
+        ))
+    models.Base.metadata.create_all(bind=baseline)
+    migrations.migrate(baseline)
+    
+    with baseline.connect() as conn:
+        cents = dict(conn.execute(text("SELECT id, amount_cents FROM transactions")).all())
+    baseline.dispose()
+    assert cents == {1: 1, 2: 13, 3: 101, 4: 1999}
+
+
+def test_zero_cent_amounts_are_clamped(db, call_api, category_ids):
+    with engine.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO transactions (amount_cents, description, transaction_type, date, category_id) "
+            "VALUES (0, 'Rounding', 'expense', '2024-03-01', :category_id)"
+        ), {"category_id": category_ids["Other"]})
+        conn.execute(text("DELETE FROM schema_migrations WHERE version = 5"))
+    migrations.migrate(engine)
+    main.startup_event()
+    
+    response = call_api(lambda client: client.get("/api/transactions"))
+    assert response.status_code == 200
+    assert [t["amount"] for t in response.json()] == [0.01]
+    assert rollups.verify(db) == []
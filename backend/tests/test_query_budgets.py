@@ -0,0 +1,74 @@
+# Every route in main.py has a query budget; list pages must not scale with their size
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.routing import APIRoute
+
+from app import crud, main, schemas
+
+STATEMENT_CSV = "Date,Description,Amount\n2024-03-01,Starbucks,-4.50\n2024-03-02,Uber ride,-12.00\n"
+
+# (method, route path, request path, request kwargs, most queries allowed)
+CASES = [
+    ("GET", "/", "/", {}, 0),
+    ("POST", "/api/parse", "/api/parse", {"json": {"text": "Starbucks $8.45"}}, 0),
+    ("POST", "/api/parse/batch", "/api/parse/batch", {"json": {"lines": ["Starbucks $8.45", "Uber 15"]}}, 0),
+    ("GET", "/api/parse/stats", "/api/parse/stats", {}, 0),
+    ("GET", "/api/categories", "/api/categories", {}, 1),
+    ("POST", "/api/categories", "/api/categories", {"json": {"name": "Travel"}}, 3),
+    ("GET", "/api/transactions", "/api/transactions?limit=500", {}, 1),
+    ("GET", "/api/transactions/page", "/api/transactions/page?limit=500", {}, 1),
+    ("GET", "/api/transactions/export", "/api/transactions/export?format=csv", {}, 1),
+    ("GET", "/api/transactions/{transaction_id}", "/api/transactions/1", {}, 1),
+    ("POST", "/api/transactions", "/api/transactions", {"json": "new"}, 10),
+    ("POST", "/api/transactions/bulk", "/api/transactions/bulk", {"json": "bulk"}, 10),
+    ("PUT", "/api/transactions/{transaction_id}", "/api/transactions/1", {"json": "new"}, 12),
+    ("DELETE", "/api/transactions/{transaction_id}", "/api/transactions/1", {}, 8),
+    ("POST", "/api/import", "/api/import", {"files": {"file": ("statement.csv", STATEMENT_CSV)}}, 9),
+    ("GET", "/api/import/{job_id}", "/api/import/missing", {}, 0),
+    ("GET", "/api/analytics/summary", "/api/analytics/summary", {}, 5),
+    ("GET", "/api/analytics/cache", "/api/analytics/cache", {}, 0),
+    ("GET", "/api/dashboard", "/api/dashboard", {}, 10),
+    ("GET", "/api/dashboard", "/api/dashboard?since=400", {}, 12),
+    ("GET", "/api/changes", "/api/changes?after=400", {}, 4),
+]
+
+
+@pytest.fixture
+def ledger(db, category_ids):
+    transactions = [
+        schemas.TransactionCreate(
+            amount=1 + i % 50, description=f"Purchase {i}", date=datetime(2024, 1, 1) + timedelta(hours=7 * i),
+            category_id=list(category_ids.values())[i % len(category_ids)],
+        )
+        for i in range(500)
+    ]
+    crud.bulk_create_transactions(db, transactions)
+    return category_ids
+
+
+def test_every_route_has_a_budget():
+    routes = {
+        (method, route.path)
+        for route in main.app.routes if isinstance(route, APIRoute)
+        for method in route.methods
+    }
+    assert routes == {(method, path) for method, path, _, _, _ in CASES}
+
+
+@pytest.mark.parametrize("method, route, path, kwargs, budget", CASES, ids=[f"{c[0]} {c[1]}" for c in CASES])
+def test_route_stays_within_query_budget(ledger, call_api, queries, method, route, path, kwargs, budget):
+    body = {"amount": 9.5, "description": "Lunch", "date": "2024-03-05T12:00:00", "category_id": ledger["Food & Drink"]}
+    if kwargs.get("json") == "new":
+        kwargs = {"json": body}
+    elif kwargs.get("json") == "bulk":
+        kwargs = {"json": {"transactions": [body] * 3}}
+
+    async def request(client):
+        queries.clear()
+        response = await client.request(method, path, **kwargs)
+        return response, list(queries)
+
+    response, issued = call_api(request)
+    assert response.status_code < 500 and response.status_code != 422, response.text
+    assert len(issued) <= budget, "\n".join(issued)
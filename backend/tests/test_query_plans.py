@@ -0,0 +1,105 @@
+# EXPLAIN QUERY PLAN checks that the hot queries in crud.py are index lookups
+import re
+from datetime import datetime
+
+import pytest
+from sqlalchemy import event
+
+from app import crud, schemas
+from app.database import engine
+
+pytestmark = pytest.mark.skipif(engine.dialect.name != "sqlite", reason="EXPLAIN QUERY PLAN is SQLite-specific")
+
+# A read of the whole table, as opposed to "SCAN transactions USING INDEX ..."
+_FULL_SCAN = re.compile(r"^SCAN (TABLE )?transactions$")
+
+
+@pytest.fixture
+def ledger(db, category_ids):
+    ids = list(category_ids.values())
+    for day in range(1, 29):
+        crud.create_transaction(db, schemas.TransactionCreate(
+            amount=day, description="Lunch", date=datetime(2024, 2, day, 12, 0), category_id=ids[day % len(ids)],
+        ))
+    return db
+
+
+def plan(db, call):
+    """Run call(db) and return the query plan lines of every SELECT, UPDATE and DELETE it issued."""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE")):
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        call(db)
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+    with engine.connect() as conn:
+        lines = [
+            row[3].replace("TABLE ", "")
+            for statement, parameters in statements
+            for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)
+        ]
+    assert not [line for line in lines if _FULL_SCAN.match(line)], lines
+    return lines
+
+
+def test_listing_walks_the_date_index(ledger):
+    lines = plan(ledger, lambda db: crud.get_transactions(db))
+    assert "SCAN transactions USING INDEX ix_transactions_date_id" in lines
+    assert "USE TEMP B-TREE FOR ORDER BY" not in lines
+
+
+def test_category_filter_uses_the_category_index(ledger, category_ids):
+    lines = plan(ledger, lambda db: crud.get_transactions(db, category_id=category_ids["Health"]))
+    assert "SEARCH transactions USING INDEX ix_transactions_category_date (category_id=?)" in lines
+    assert "USE TEMP B-TREE FOR ORDER BY" not in lines
+
+
+def test_date_range_uses_the_date_index(ledger):
+    lines = plan(ledger, lambda db: crud.get_transactions(
+        db, start_date=datetime(2024, 2, 3), end_date=datetime(2024, 2, 9),
+    ))
+    assert "SEARCH transactions USING INDEX ix_transactions_date_id (date>? AND date<?)" in lines
+
+
+def test_keyset_page_seeks_past_the_cursor(ledger):
+    _, next_cursor, _ = crud.get_transactions_page(ledger, limit=5)
+    lines = plan(ledger, lambda db: crud.get_transactions_page(db, limit=5, cursor=next_cursor))
+    assert "SEARCH transactions USING INDEX ix_transactions_date_id (date<?)" in lines
+    assert "USE TEMP B-TREE FOR ORDER BY" not in lines
+
+
+def test_single_transaction_is_a_primary_key_lookup(ledger):
+    lines = plan(ledger, lambda db: crud.get_transaction(db, 3))
+    assert "SEARCH transactions USING INTEGER PRIMARY KEY (rowid=?)" in lines
+
+
+def test_summary_reads_rollups_and_date_bounded_edges(ledger):
+    lines = plan(ledger, lambda db: crud.get_analytics_summary(
+        db, start_date=datetime(2024, 1, 20, 6, 0), end_date=datetime(2024, 3, 10, 6, 0),
+    ))
+    assert "SEARCH transactions USING INDEX ix_transactions_date_id (date>? AND date<?)" in lines
+    assert "SEARCH monthly_rollups USING INDEX sqlite_autoindex_monthly_rollups_1 (month>? AND month<?)" in lines
+    assert "SEARCH daily_rollups USING INDEX sqlite_autoindex_daily_rollups_1 (day>? AND day<?)" in lines
+
+
+def test_writes_touch_rows_by_key(ledger, category_ids):
+    update = schemas.TransactionCreate(
+        amount=5, description="Taxi", date=datetime(2024, 3, 1, 9, 0), category_id=category_ids["Transportation"],
+    )
+    lines = plan(ledger, lambda db: crud.update_transaction(db, 4, update))
+    lines += plan(ledger, lambda db: crud.delete_transaction(db, 5))
+    assert "SEARCH transactions USING INTEGER PRIMARY KEY (rowid=?)" in lines
+    assert "SEARCH daily_rollups USING INDEX sqlite_autoindex_daily_rollups_1 (day=?)" in lines
+
+
+def test_change_feed_seeks_by_seq(ledger):
+    lines = plan(ledger, lambda db: crud.get_changes(db, after=10))
+    lines += plan(ledger, lambda db: crud.get_changed_transactions(db, since=10, until=20))
+    assert "SEARCH transaction_changes USING INTEGER PRIMARY KEY (rowid>?)" in lines
+    assert "SEARCH transaction_changes USING INTEGER PRIMARY KEY (rowid>? AND rowid<?)" in lines
@@ -0,0 +1,151 @@
+# Retry budget, circuit breaker and guard around OpenAI calls
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from app import ai_parser, resilience
+
+
+class Transient(Exception):
+    pass
+
+
+def _guard(**kwargs):
+    return resilience.Guard(retryable=(Transient,), base_delay=0, max_delay=0, **kwargs)
+
+
+def test_retry_budget_allows_retries_on_a_fraction_of_calls():
+    budget = resilience.RetryBudget(ratio=0.5, max_tokens=2)
+    assert [budget.withdraw() for _ in range(3)] == [True, True, False]
+    budget.deposit()
+    assert not budget.withdraw()
+    budget.deposit()
+    assert budget.withdraw()
+    for _ in range(10):
+        budget.deposit()
+    assert budget.tokens == 2
+
+
+def test_breaker_opens_on_error_rate_and_closes_after_a_good_probe(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(resilience.time, "monotonic", lambda: now[0])
+    breaker = resilience.CircuitBreaker(error_rate=0.5, cooldown=10, window=4, min_calls=4)
+
+    for ok in (True, False, True):
+        breaker.record(breaker.allow(), ok)
+    assert breaker.state == "closed"
+    breaker.record(breaker.allow(), False)
+    assert (breaker.state, breaker.trips) == ("open", 1)
+    assert breaker.allow() is None
+
+    now[0] += 10
+    assert breaker.state == "half_open"
+    probe = breaker.allow()
+    assert probe == "probe" and breaker.allow() is None
+    breaker.record(probe, False)
+    assert breaker.state == "open"
+
+    now[0] += 10
+    breaker.record(breaker.allow(), True)
+    assert breaker.state == "closed"
+
+
+def test_abandoned_probe_lets_another_through(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(resilience.time, "monotonic", lambda: now[0])
+    breaker = resilience.CircuitBreaker(error_rate=0.5, cooldown=10, window=2, min_calls=2)
+    breaker.record(breaker.allow(), False)
+    breaker.record(breaker.allow(), False)
+    now[0] += 10
+
+    breaker.abandon(breaker.allow())
+    assert breaker.allow() == "probe"
+
+
+def test_guard_retries_transient_errors():
+    guard = _guard(max_retries=2)
+    attempts = []
+
+    async def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise Transient("503")
+        return "ok"
+
+    assert asyncio.run(guard.call(flaky, timeout=5)) == "ok"
+    assert (guard.retries, guard.failures) == (2, 0)
+
+
+def test_guard_gives_up_when_retries_run_out():
+    guard = _guard(max_retries=1)
+
+    async def down():
+        raise Transient("503")
+
+    with pytest.raises(resilience.Unavailable):
+        asyncio.run(guard.call(down, timeout=5))
+    assert (guard.retries, guard.failures) == (1, 1)
+
+
+def test_guard_does_not_retry_bad_requests():
+    guard = _guard(max_retries=2)
+
+    async def bad():
+        raise ValueError("400")
+
+    with pytest.raises(ValueError):
+        asyncio.run(guard.call(bad, timeout=5))
+    assert guard.retries == 0
+    assert list(guard.breaker._outcomes) == [True]
+
+
+def test_guard_times_out_and_fails_fast_while_open():
+    guard = _guard(max_retries=0)
+    guard.breaker = resilience.CircuitBreaker(error_rate=0.5, cooldown=60, window=1, min_calls=1)
+
+    async def slow():
+        await asyncio.sleep(1)
+
+    with pytest.raises(resilience.Unavailable, match="timed out"):
+        asyncio.run(guard.call(slow, timeout=0.05))
+    with pytest.raises(resilience.Unavailable, match="unavailable"):
+        asyncio.run(guard.call(slow, timeout=0.05))
+    assert (guard.timeouts, guard.breaker.rejected) == (1, 1)
+
+
+def _tool_response(arguments):
+    call = SimpleNamespace(function=SimpleNamespace(arguments=json.dumps(arguments)))
+    return SimpleNamespace(usage=None, choices=[SimpleNamespace(message=SimpleNamespace(tool_calls=[call]))])
+
+
+def test_waiting_for_a_call_slot_does_not_count_against_the_deadline(monkeypatch):
+    async def create(**kwargs):
+        await asyncio.sleep(0.1)
+        return _tool_response({"amount": 1})
+
+    monkeypatch.setattr(ai_parser, "client", SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create))))
+    monkeypatch.setattr(ai_parser, "guard", _guard(max_retries=0))
+
+    async def main():
+        monkeypatch.setattr(ai_parser, "_llm_slots", asyncio.Semaphore(1))
+        # Five calls through one slot take ~0.5s, each well within its own 0.3s deadline
+        return await asyncio.gather(*(
+            ai_parser._call_tool("llm", ai_parser._PARSE_TOOL, "x", 64, timeout=0.3) for _ in range(5)
+        ))
+
+    assert asyncio.run(main()) == [{"amount": 1}] * 5
+    assert ai_parser.guard.timeouts == 0
+    assert ai_parser.guard.breaker.state == "closed"
+
+
+def test_rule_fallbacks_during_an_outage_are_not_cached(monkeypatch):
+    async def call_tool(*args, **kwargs):
+        raise resilience.Unavailable("AI parser is temporarily unavailable")
+
+    monkeypatch.setattr(ai_parser, "_call_tool", call_tool)
+    results = asyncio.run(ai_parser.parse_batch(["zorblax 40"]))
+
+    assert results[0]["success"] and results[0]["data"]["source"] == "rules"
+    assert ai_parser.cache.get("zorblax 12") is None
@@ -0,0 +1,77 @@
+import asyncio
+from datetime import datetime
+
+from app import crud, models, rollups, schemas
+
+
+def _transaction(category_id, amount=10.0, date=datetime(2024, 3, 5, 12, 0), **fields):
+    return schemas.TransactionCreate(
+        amount=amount, description="Lunch", date=date, category_id=category_id, **fields
+    )
+
+
+def test_rollups_follow_creates_updates_and_deletes(db, category_ids):
+    food, transport = category_ids["Food & Drink"], category_ids["Transportation"]
+    first = crud.create_transaction(db, _transaction(food, 12.5))
+    second = crud.create_transaction(db, _transaction(food, 7.25, date=datetime(2024, 4, 1, 9, 0)))
+    crud.update_transaction(db, first.id, _transaction(transport, 30.0, date=datetime(2024, 5, 31, 23, 0)))
+    crud.delete_transaction(db, second.id)
+
+    assert rollups.verify(db) == []
+    summary = crud.get_analytics_summary(db)
+    assert summary.total_expenses == 30.0
+    assert [(c.category_name, c.count) for c in summary.by_category] == [("Transportation", 1)]
+
+
+def test_summary_combines_months_days_and_partial_edges(db, category_ids):
+    food = category_ids["Food & Drink"]
+    for day in (datetime(2024, 1, 31, 20, 0), datetime(2024, 2, 1, 8, 0), datetime(2024, 3, 15, 6, 0),
+                datetime(2024, 4, 2, 18, 0), datetime(2024, 4, 3, 0, 0)):
+        crud.create_transaction(db, _transaction(food, 1.0, date=day))
+
+    summary = crud.get_analytics_summary(db, start_date=datetime(2024, 1, 31, 12, 0), end_date=datetime(2024, 4, 2, 12, 0))
+    assert summary.total_expenses == 3.0
+
+
+def test_concurrent_updates_keep_rollups_exact(db, category_ids, call_api):
+    food, transport = category_ids["Food & Drink"], category_ids["Transportation"]
+    transaction = crud.create_transaction(db, _transaction(food))
+
+    async def flip(client):
+        async def put(i):
+            body = {
+                "amount": 10 + i,
+                "description": "Lunch",
+                "date": datetime(2024, 3 + i % 2, 5, 12, 0).isoformat(),
+                "category_id": food if i % 2 else transport,
+            }
+            return await client.put(f"/api/transactions/{transaction.id}", json=body)
+        return await asyncio.gather(*(put(i) for i in range(200)))
+
+    responses = call_api(flip)
+    assert {r.status_code for r in responses} == {200}
+
+    db.expire_all()
+    assert rollups.verify(db) == []
+    summary = crud.get_analytics_summary(db)
+    assert sum(c.count for c in summary.by_category) == 1
+    assert db.query(models.DailyRollup).count() == 1
+
+
+def test_concurrent_creates_and_deletes_keep_rollups_exact(db, category_ids, call_api):
+    food = category_ids["Food & Drink"]
+    doomed = [crud.create_transaction(db, _transaction(food, 1.0)).id for _ in range(50)]
+
+    async def churn(client):
+        body = {"amount": 2.0, "description": "Lunch", "date": "2024-03-05T12:00:00", "category_id": food}
+        return await asyncio.gather(
+            *(client.post("/api/transactions", json=body) for _ in range(100)),
+            *(client.delete(f"/api/transactions/{i}") for i in doomed),
+        )
+
+    responses = call_api(churn)
+    assert [r.status_code for r in responses] == [201] * 100 + [204] * 50
+
+    db.expire_all()
+    assert rollups.verify(db) == []
+    assert crud.get_analytics_summary(db).total_expenses == 200.0
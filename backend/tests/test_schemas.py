@@ -0,0 +1,26 @@
+# Decimal amounts convert to cents half up
+import pytest
+from pydantic import ValidationError
+
+from app.schemas import TransactionCreate, to_cents
+
+
+def test_to_cents_rounds_half_up():
+    assert [to_cents(a) for a in (0.125, 1.005, 2.675, 0.004, 0.005, 19.99)] == [13, 101, 268, 0, 1, 1999]
+
+
+@pytest.mark.parametrize("amount", [float("inf"), float("nan"), 1e300, 1e17])
+def test_unrepresentable_amounts_are_rejected(amount):
+    with pytest.raises(ValidationError):
+        TransactionCreate(amount=amount, description="Huge", date="2024-03-05T12:00:00", category_id=1)
+
+
+@pytest.mark.parametrize("amount", ["Infinity", "1e300", "1e17"])
+def test_unrepresentable_amounts_are_422(call_api, category_ids, amount):
+    body = '{"amount": %s, "description": "Huge", "date": "2024-03-05T12:00:00", "category_id": %d}' % (
+        amount, category_ids["Other"],
+    )
+    response = call_api(lambda client: client.post(
+        "/api/transactions", content=body, headers={"Content-Type": "application/json"},
+    ))
+    assert response.status_code == 422
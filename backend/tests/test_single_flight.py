@@ -0,0 +1,116 @@
+# Concurrent callers share one computation, and a cancelled caller never strands the others
+import asyncio
+
+from app.analytics_cache import SummaryCache
+from app.single_flight import SingleFlight
+
+
+def test_concurrent_callers_share_one_computation():
+    calls = []
+
+    async def main():
+        flights = SingleFlight()
+        release = asyncio.Event()
+
+        async def compute():
+            calls.append(1)
+            await release.wait()
+            return "result"
+
+        tasks = [asyncio.create_task(flights.run("key", compute)) for _ in range(5)]
+        await asyncio.sleep(0)
+        assert len(flights) == 1
+        release.set()
+        results = await asyncio.gather(*tasks)
+        assert len(flights) == 0
+        return results
+
+    results = asyncio.run(main())
+    assert len(calls) == 1
+    assert sorted(results, key=lambda r: r[1]) == [("result", False)] + [("result", True)] * 4
+
+
+def test_waiter_takes_over_when_the_computing_caller_is_cancelled():
+    async def main():
+        flights = SingleFlight()
+        started = asyncio.Event()
+
+        async def stuck():
+            started.set()
+            await asyncio.sleep(60)
+
+        async def quick():
+            return "taken over"
+
+        leader = asyncio.create_task(flights.run("key", stuck))
+        await started.wait()
+        waiter = asyncio.create_task(flights.run("key", quick))
+        await asyncio.sleep(0)
+        leader.cancel()
+        return await waiter
+
+    assert asyncio.run(main()) == ("taken over", False)
+
+
+def test_cancelled_waiter_leaves_the_computation_running():
+    async def main():
+        flights = SingleFlight()
+        release = asyncio.Event()
+
+        async def compute():
+            await release.wait()
+            return "result"
+
+        leader = asyncio.create_task(flights.run("key", compute))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(flights.run("key", compute))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        return await leader, waiter.cancelled()
+
+    assert asyncio.run(main()) == (("result", False), True)
+
+
+def test_errors_reach_every_waiter():
+    async def main():
+        flights = SingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0)
+            raise ValueError("boom")
+
+        return await asyncio.gather(*(flights.run("key", fail) for _ in range(3)), return_exceptions=True)
+
+    assert [str(e) for e in asyncio.run(main())] == ["boom"] * 3
+
+
+def test_summary_from_a_superseded_generation_is_not_cached():
+    computed = []
+
+    async def main():
+        cache = SummaryCache()
+        release = asyncio.Event()
+
+        async def old():
+            computed.append("old")
+            await release.wait()
+            return "old summary"
+
+        async def new():
+            computed.append("new")
+            return "new summary"
+
+        stale = asyncio.create_task(cache.get(("k", None), (1, 1), old))
+        await asyncio.sleep(0)
+        # A write moved the generation on; the new caller must not join the old computation
+        assert await cache.get(("k", None), (2, 1), new) == "new summary"
+        release.set()
+        assert await stale == "old summary"
+        assert await cache.get(("k", None), (2, 1), old) == "new summary"
+        return cache.stats()
+
+    stats = asyncio.run(main())
+    assert computed == ["old", "new"]
+    assert (stats["misses"], stats["hits"], stats["coalesced"]) == (2, 1, 0)
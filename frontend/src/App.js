@@ -1,4 +1,4 @@
-import React, { useState, useEffect, useCallback } from 'react';
+import React, { useState, useEffect, useCallback, useRef } from 'react';
 import { Chart as ChartJS, ArcElement, Tooltip, Legend } from 'chart.js';
 import { Doughnut } from 'react-chartjs-2';
 import logo from './assets/nonna-logo.png';
@@ -29,24 +29,33 @@ function App() {
   const [editingTransaction, setEditingTransaction] = useState(null);
   const [editFormData, setEditFormData] = useState(null);
 
-  // Fetch all data
+  // Change token from the last dashboard response, for delta refreshes
+  const changeTokenRef = useRef(null);
+
+  // Fetch dashboard data (only changed transactions after the first load)
   const fetchData = useCallback(async () => {
     try {
-      const [transRes, catRes, analyticsRes] = await Promise.all([
-        fetch(`${API_URL}/transactions`),
-        fetch(`${API_URL}/categories`),
-        fetch(`${API_URL}/analytics/summary`),
-      ]);
-
-      const [transData, catData, analyticsData] = await Promise.all([
-        transRes.json(),
-        catRes.json(),
-        analyticsRes.json(),
-      ]);
-
-      setTransactions(transData);
-      setCategories(catData);
-      setAnalytics(analyticsData);
+      const since = changeTokenRef.current;
+      const response = await fetch(
+        since === null ? `${API_URL}/dashboard` : `${API_URL}/dashboard?since=${since}`
+      );
+      const data = await response.json();
+
+      if (data.full) {
+        setTransactions(data.transactions);
+      } else {
+        setTransactions(prev => {
+          const changedIds = new Set(data.transactions.map(t => t.id));
+          const deletedIds = new Set(data.deleted_ids);
+          return prev
+            .filter(t => !changedIds.has(t.id) && !deletedIds.has(t.id))
+            .concat(data.transactions)
+            .sort((a, b) => (b.date.localeCompare(a.date) || b.id - a.id));
+        });
+      }
+      changeTokenRef.current = data.change_token;
+      setCategories(data.categories);
+      setAnalytics(data.summary);
     } catch (error) {
       console.error('Error fetching data:', error);
     } finally {